@@ -1,7 +1,17 @@
 import streamlit as st
-import openai
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from shared.artifact_store import get_store, artifact_key
+from shared.tts_pipeline import synthesize, synthesize_stream
+from shared.audio_player import SequentialPlayer
+
+client = get_client()
+# Scripts and audio are cached on disk, so a repeated topic costs nothing
+store = get_store()
+
 # Page setup
 st.set_page_config(page_title="Podcast Generator", page_icon="🎧")
 
@@ -21,36 +31,62 @@ if st.button("Generate Podcast"):
     elif not topic.strip():
         st.error("Please enter a podcast topic.")
     else:
-        openai.api_key = openai_api_key
-
-        with st.spinner("🎬 Generating podcast script..."):
-            # Step 1: Generate podcast script
-            script_response = openai.chat.completions.create(
-                model="gpt-4o-mini",  # Lighter model, faster for generation
-                messages=[
-                    {"role": "system", "content": "You are a podcast script writer."},
-                    {"role": "user", "content": f"Write a detailed, engaging podcast script about {topic}. Make it around 500 words."}
-                ]
-            )
-            podcast_script = script_response.choices[0].message.content
-
-        st.subheader("📜 Generated Podcast Script")
-        st.write(podcast_script)
-
-        with st.spinner("🎙️ Converting script to speech..."):
-            # Step 2: Convert script to audio
-            speech_file_path = Path("podcast.mp3")
-
-            with openai.audio.speech.with_streaming_response.create(
-                model="gpt-4o-mini-tts",
-                voice="alloy",
-                input=podcast_script
-            ) as response:
-                response.stream_to_file(speech_file_path)
-
-        # Step 3: Play podcast
-        audio_file = open("podcast.mp3", "rb")
-        st.audio(audio_file.read(), format="audio/mp3")
-        audio_file.close()
+        model, tts_model, voice = "gpt-4o-mini", "gpt-4o-mini-tts", "alloy"  # Lighter model, faster for generation
+        messages = [
+            {"role": "system", "content": "You are a podcast script writer."},
+            {"role": "user", "content": f"Write a detailed, engaging podcast script about {topic}. Make it around 500 words."}
+        ]
+        script_key = artifact_key(kind="podcast_script", model=model, messages=messages)
+        # One session writes a given topic's script at a time; another asking for
+        # the same topic waits, then plays the stored script and audio
+        with store.key_lock(script_key):
+            cached_script = store.get(script_key, ".txt")
+
+            st.subheader("📜 Generated Podcast Script")
+            script_box = st.empty()
+            st.subheader("🎙️ Podcast")
+            audio_box = st.container()
+
+            podcast_script = cached_script.decode("utf-8") if cached_script is not None else ""
+            audio_key = artifact_key(kind="speech", model=tts_model, text=podcast_script, voice=voice)
+            audio_bytes = store.get(audio_key, ".mp3") if cached_script is not None else None
+            script_box.write(podcast_script)
+
+            if audio_bytes is not None:
+                # Step 3: Play podcast
+                audio_box.audio(audio_bytes, format="audio/mp3")
+            else:
+                timings = {}
+                if cached_script is not None:
+                    # Script is known: synthesize its chunks in parallel
+                    chunks = synthesize(client, podcast_script, voice=voice, model=tts_model, api_key=openai_api_key, store=store, timings=timings)
+                    events = (("audio", part) for part in client.iter_sync(chunks))
+                else:
+                    # Stream the script and send each finished passage to TTS while
+                    # the rest is still being written
+                    tokens = client.chat_stream(messages, model=model, api_key=openai_api_key)
+                    events = client.iter_sync(synthesize_stream(client, tokens, voice=voice, model=tts_model, api_key=openai_api_key, store=store, timings=timings))
+
+                parts = []
+                player = None  # one player for all parts, created with the first
+                with st.spinner("🎬 Writing and recording the podcast..."):
+                    for kind, value in events:
+                        if kind == "text":
+                            podcast_script += value
+                            script_box.write(podcast_script)
+                        else:
+                            parts.append(value)
+                            player = player or SequentialPlayer(audio_box)
+                            player.add(value)
+
+                if cached_script is None:
+                    store.put(script_key, podcast_script.encode("utf-8"), ".txt")
+                audio_bytes = b"".join(parts)
+                store.put(artifact_key(kind="speech", model=tts_model, text=podcast_script, voice=voice), audio_bytes, ".mp3")
+
+                labels = {"first_token": "first token", "script": "script done", "first_audio": "first audio", "total": "all audio"}
+                st.caption("Timings: " + ", ".join(f"{label} {timings[k]:.1f}s" for k, label in labels.items() if k in timings))
+
+        st.download_button("📥 Download podcast", data=audio_bytes, file_name="podcast.mp3", mime="audio/mpeg")
 
         st.success("✅ Podcast generated successfully!")
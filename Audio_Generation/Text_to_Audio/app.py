@@ -1,7 +1,17 @@
 import streamlit as st
-import openai
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from shared.artifact_store import get_store, artifact_key
+from shared.tts_pipeline import synthesize
+from shared.audio_player import SequentialPlayer
+
+client = get_client()
+# Generated speech is cached on disk by (model, text, voice)
+store = get_store()
+
 # Set page title
 st.set_page_config(page_title="Text to Speech App", page_icon="🎙️")
 
@@ -25,22 +35,29 @@ if st.button("Generate Speech"):
     elif not text_input.strip():
         st.error("Please enter some text.")
     else:
-        openai.api_key = openai_api_key
-
-        # Define output file
-        speech_file_path = Path("speech.mp3")
-
-        # Generate speech
-        with openai.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice=voice,
-            input=text_input
-        ) as response:
-            response.stream_to_file(speech_file_path)
-
-        # Play audio in the app
-        audio_file = open("speech.mp3", "rb")
-        st.audio(audio_file.read(), format="audio/mp3")
-        audio_file.close()
+        model = "gpt-4o-mini-tts"
+
+        key = artifact_key(kind="speech", model=model, text=text_input, voice=voice)
+        audio_bytes = store.get(key, ".mp3")
+
+        if audio_bytes is not None:
+            # Play audio in the app
+            st.audio(audio_bytes, format="audio/mp3")
+            st.caption("Served from cache")
+        else:
+            # Generate speech sentence chunk by chunk, in parallel; one player
+            # starts on the first part and plays the rest in order as they arrive
+            timings = {}
+            parts = []
+            player = SequentialPlayer()
+            chunks = synthesize(client, text_input, voice=voice, model=model, api_key=openai_api_key, store=store, timings=timings)
+            for part in client.iter_sync(chunks):
+                parts.append(part)
+                player.add(part)
+            audio_bytes = b"".join(parts)
+            store.put(key, audio_bytes, ".mp3")
+            st.caption(f"First audio after {timings['first_audio']:.1f}s, all {timings['chunks']} parts after {timings['total']:.1f}s")
+
+        st.download_button("📥 Download MP3", data=audio_bytes, file_name="speech.mp3", mime="audio/mpeg")
 
         st.success("✅ Speech generated successfully!")
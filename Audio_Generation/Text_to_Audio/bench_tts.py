@@ -0,0 +1,36 @@
+# Time-to-first-audio and wall-clock time for one TTS request versus the
+# chunked parallel pipeline. Point OPENAI_BASE_URL at the fake server
+# (python -m benchmarks.fake_server, from the repository root) to run it offline:
+#   OPENAI_BASE_URL=http://localhost:8000/v1 OPENAI_API_KEY=test python bench_tts.py
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from shared.tts_pipeline import synthesize
+
+TEXT = " ".join(
+    f"Paragraph {i} of the script talks about the future of artificial intelligence and what it means for everyday work."
+    for i in range(35)
+)  # ~4000 characters, just under the 4096-character limit of a single TTS request
+
+def bench_single(client):
+    start = time.perf_counter()
+    client.run(client.speech(TEXT))
+    elapsed = time.perf_counter() - start
+    return {"first_audio": elapsed, "total": elapsed}
+
+def bench_chunked(client, concurrency):
+    timings = {}
+    for _ in client.iter_sync(synthesize(client, TEXT, concurrency=concurrency, timings=timings)):
+        pass
+    return timings
+
+if __name__ == "__main__":
+    client = get_client()
+    print(f"{len(TEXT)} characters")
+    for name, timings in [("single request", bench_single(client))] + [
+        (f"chunked x{c}", bench_chunked(client, c)) for c in (1, 4, 8)
+    ]:
+        print(f"{name:<16} first audio {timings['first_audio']:6.2f}s   total {timings['total']:6.2f}s")
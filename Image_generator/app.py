@@ -1,9 +1,16 @@
 import streamlit as st
-import base64
-from openai import OpenAI
+import sys
+import time
+from pathlib import Path
 
-# Initialize OpenAI client
-client = OpenAI()
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.image_jobs import get_image_queue
+from shared.telemetry import serve_metrics
+
+# Generation runs in a background job queue shared by all sessions; finished
+# images are cached on disk by (model, prompt, size, variant)
+jobs = get_image_queue()
+serve_metrics()  # Prometheus text on METRICS_PORT, if set
 
 # Streamlit App
 st.title("🖼️ OpenAI Image Generator")
@@ -11,30 +18,42 @@ st.write("Enter a prompt below to generate an image using OpenAI's model.")
 
 # Input prompt
 prompt = st.text_input("Enter prompt for image generation:")
+variants = st.slider("Variants", 1, 4, 1)
+preview = st.checkbox("Show a low-quality draft while rendering (a separate, extra generation)", value=False)
 
 if st.button("Generate Image"):
     if prompt:
-        try:
-            with st.spinner("Generating image... ⏳"):
-                # Call OpenAI Image API
-                img = client.images.generate(
-                    model="gpt-image-1",
-                    prompt=prompt,
-                    n=1,
-                    size="1024x1024"
-                )
-
-                # Decode base64 image
-                image_bytes = base64.b64decode(img.data[0].b64_json)
-
-                # Save temp image
-                with open("generated_image.png", "wb") as f:
-                    f.write(image_bytes)
-
-                # Display in Streamlit
-                st.image("generated_image.png", caption="Generated Image", use_container_width=True)
-
-        except Exception as e:
-            st.error(f"Error: {e}")
+        # Returns at once; the page keeps working while the job runs
+        job_id = jobs.submit(prompt, n=variants, model="gpt-image-1", size="1024x1024", preview=preview)
+        st.session_state.setdefault("image_jobs", []).insert(0, job_id)
     else:
         st.warning("Please enter a prompt first!")
+
+# Newest first; jobs still running are polled by re-running the script
+pending = False
+for job_id in st.session_state.get("image_jobs", []):
+    job = jobs.get(job_id)
+    if job is None:
+        continue  # dropped from the queue's history
+    st.markdown(f"**{job.prompt}**")
+    if job.status == "failed":
+        st.error(f"Error: {job.error}")
+    elif job.images or job.previews:
+        shown = job.images or job.previews
+        for i, (column, image) in enumerate(zip(st.columns(len(shown)), shown)):
+            caption = f"Variant {i + 1}" if job.images else f"Draft {i + 1} (separate low-quality render)"
+            column.image(image, caption=caption, use_container_width=True)
+    else:
+        st.info(f"{job.status.title()}... ⏳")
+    details = f"{job.seconds:.1f}s"
+    if job.done and job.cached:
+        details += f", {job.cached} of {job.n} from cache"
+    st.caption(details)
+    pending = pending or not job.done
+
+stats = jobs.stats()
+st.sidebar.caption(f"Image jobs: {stats['queued']} queued, {stats['running']} running")
+
+if pending:
+    time.sleep(0.5)
+    st.rerun()
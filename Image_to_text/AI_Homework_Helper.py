@@ -1,47 +1,76 @@
 import streamlit as st
-from openai import OpenAI
-import base64
+import queue
+import sys
+from pathlib import Path
 
-client = OpenAI()
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from homework_solver import SolutionCache, solve_cached, solve_batch
+
+client = get_client()
+
+
+@st.cache_resource
+def get_solution_cache():
+    # One cache for every session: a worksheet solved for one student is reused for the class
+    return SolutionCache(maxsize=500)
+
+cache = get_solution_cache()
 
 st.title("📘 AI Homework Helper")
 
-uploaded_file = st.file_uploader("Upload a photo of your math problem", type=["jpg", "jpeg", "png"])
-
-if uploaded_file is not None:
-    st.image(uploaded_file, caption="Uploaded Problem", width="stretch")
-
-    if st.button("Solve"):
-        with st.spinner("Analyzing and solving... ⏳"):
-            # Convert image to base64
-            file_bytes = uploaded_file.read()
-            base64_image = base64.b64encode(file_bytes).decode("utf-8")
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert math tutor. "
-                            "Your task is to carefully analyze the math problem in the image. "
-                            "Solve it step by step using clear explanations, equations, and reasoning. "
-                            
-                            "Show formulas, intermediate steps, and the final answer in a structured way. "
-                            "If multiple methods exist, explain the most efficient one. "
-                            "Keep it simple, clear, and student-friendly."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Please solve this math problem with detailed steps and proper formulas."},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                        ]
-                    }
-                ]
-            )
-
-            answer = response.choices[0].message.content
-            st.markdown("### ✅ Solution")
-            st.markdown(answer)
+mode = st.radio("Mode", ["Single problem", "Multiple problems"], horizontal=True)
+
+if mode == "Single problem":
+    uploaded_file = st.file_uploader("Upload a photo of your math problem", type=["jpg", "jpeg", "png"])
+
+    if uploaded_file is not None:
+        st.image(uploaded_file, caption="Uploaded Problem", width="stretch")
+
+        if st.button("Solve"):
+            with st.spinner("Analyzing and solving... ⏳"):
+                # Downscale and recompress before upload, unless a look-alike photo was already solved
+                result = client.run(solve_cached(client, cache, uploaded_file.getvalue()))
+
+                st.markdown("### ✅ Solution")
+                st.markdown(result["solution"])
+                if result["cached"]:
+                    st.caption("Same problem as an earlier upload; reused its solution")
+                else:
+                    st.caption(f"{result['bytes_saved'] / 1024:.0f} KB saved on upload")
+
+else:
+    uploaded_files = st.file_uploader("Upload photos of your math problems", type=["jpg", "jpeg", "png"],
+                                      accept_multiple_files=True)
+    workers = st.slider("Parallel workers", 1, 16, 4)
+
+    if uploaded_files and st.button("Solve all"):
+        uploads = [(f.name, f.getvalue()) for f in uploaded_files]
+
+        # Workers run on the client's event loop; results come back through a queue
+        # so this script thread can update the page.
+        results = queue.Queue()
+        future = client.submit(solve_batch(client, cache, uploads, workers, results.put))
+        progress = st.progress(0.0, text="Solving...")
+        finished = 0
+        while not future.done() or not results.empty():
+            try:
+                result = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            finished += 1
+            progress.progress(min(1.0, finished / len(uploads)), text=f"{result['name']} done")
+            with st.expander(f"{'♻️' if result['cached'] else '✅'} {result['name']}"):
+                if result["error"]:
+                    st.error(f"⚠️ Could not solve this one: {result['error']}")
+                else:
+                    st.markdown(result["solution"])
+        summary = future.result()
+        progress.progress(1.0, text="Done")
+        st.success(
+            f"✅ {summary['solved']} solved, {summary['cached']} reused, {summary['failed']} failed — "
+            f"{summary['problems_per_minute']:.1f} problems/min"
+        )
+        stats = cache.stats()
+        st.caption(f"Cache hit rate: {summary['hit_rate']:.0%} this batch, {stats['hit_rate']:.0%} overall "
+                   f"({stats['entries']} solutions cached)")
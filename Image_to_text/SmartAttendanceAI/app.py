@@ -1,108 +1,140 @@
 # SmartAttendance AI (LLM Vision-based)
 # ------------------------------------
 # pip install openai pandas openpyxl streamlit pillow
+# Optional: pip install face_recognition  (match faces locally instead of calling the API)
 
 import streamlit as st
-from openai import OpenAI
 from datetime import date
-import pandas as pd
-from io import BytesIO
-import base64
+import queue
+import re
+import sys
+from pathlib import Path
 
-client = OpenAI(api_key="YOUR_GPT5_API_KEY")  # Replace with your key
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from roster_index import RosterIndex
+from attendance import analyze, parse_filename
+from attendance_ledger import AttendanceLedger, content_hash
+from batch_attendance import run_batch
+
+OPENAI_API_KEY = "YOUR_GPT5_API_KEY"  # Replace with your key
+client = get_client()
+
+APP_DIR = Path(__file__).resolve().parent
+# Every attendance result is appended here; Excel reports are built from it on demand
+ledger = AttendanceLedger(APP_DIR / "attendance.db")
 
 st.set_page_config(page_title="SmartAttendance AI", page_icon="🎓")
 st.title("🎓 SmartAttendance AI – GPT-5 Vision Edition")
-st.write("Upload a classroom image and student reference photos; GPT-5 Vision will identify who’s present.")
+st.write("Upload a classroom image and student reference photos; GPT-5 Vision will identify who’s present. Reference photos are remembered, so only new or changed ones need uploading.")
+
+# Reference photos are indexed once per class and kept next to the app
+class_name = st.text_input("Class", "default")
+class_key = re.sub(r"[^A-Za-z0-9_-]+", "_", class_name.strip()) or "default"  # roster folder and ledger class
+roster = RosterIndex(APP_DIR / "roster" / class_key)
 
 # Uploads
-classroom_img = st.file_uploader("Upload classroom image", type=["jpg","jpeg","png"])
 ref_images = st.file_uploader("Upload student reference images (multiple allowed)", type=["jpg","jpeg","png"], accept_multiple_files=True)
 
-if classroom_img and ref_images:
-    st.image(classroom_img, caption="Classroom Image", use_column_width=True)
-    st.info(f"{len(ref_images)} reference images uploaded.")
-
-    if st.button("Mark Attendance with GPT-5 Vision"):
-        # Convert uploaded files to base64 URLs for GPT-5 input
-        def to_data_uri(file):
-            b64 = base64.b64encode(file.read()).decode("utf-8")
-            return f"data:image/jpeg;base64,{b64}"
-
-        classroom_uri = to_data_uri(classroom_img)
-        ref_data = []
-        for file in ref_images:
-            name = file.name.split(".")[0]
-            uri = to_data_uri(file)
-            ref_data.append({"name": name, "uri": uri})
-
-        # Construct the LLM prompt
-        prompt = f"""
-        You are SmartAttendance GPT, an AI vision system that marks classroom attendance.
-
-        Compare the classroom image with the provided reference student images.
-        Identify which students are visible (present) and which are missing (absent).
-
-        Return the result as a JSON object like:
-        {{
-          "date": "{str(date.today())}",
-          "present": ["Rahul","Sneha"],
-          "absent": ["Priya"]
-        }}
-
-        Only include names that match the reference photos. 
-        Base your analysis on clear visual similarity of faces.
-        """
-
-        # Prepare message structure for GPT-5 Vision
-        vision_inputs = [
-            {"type": "text", "text": prompt},
-            {"type": "image_url", "image_url": classroom_uri},
-        ]
-        for r in ref_data:
-            vision_inputs.append({"type": "image_url", "image_url": r["uri"]})
-
-        # Send to GPT-5
-        with st.spinner("Analyzing image with GPT-5 Vision..."):
-            response = client.chat.completions.create(
-                model="gpt-5-vision",
-                messages=[{"role": "user", "content": vision_inputs}],
-                temperature=0.1
-            )
-
-        output = response.choices[0].message.content
-        st.subheader("📋 GPT-5 Output")
-        st.code(output)
-
-        # Parse GPT output safely
-        try:
-            import json
-            result = json.loads(output)
-            present = result.get("present", [])
-            absent = result.get("absent", [])
-        except:
-            st.error("⚠️ Could not parse model output as JSON. Check result above.")
-            present, absent = [], []
-
-        # Write to Excel
-        if present or absent:
-            all_students = [r["name"] for r in ref_data]
-            df = pd.DataFrame({
-                "Date": [str(date.today())]*len(all_students),
-                "Student": all_students,
-                "Attendance": ["Present" if s in present else "Absent" for s in all_students]
-            })
-
-            file_name = "attendance.xlsx"
-            df.to_excel(file_name, index=False)
-            st.success("✅ Attendance saved to attendance.xlsx")
-
-            # Download link
-            with open(file_name, "rb") as f:
-                b = f.read()
-                st.download_button("📥 Download Excel Report", data=b, file_name=file_name, mime="application/vnd.ms-excel")
-
-            # Summary
-            st.write(f"**Present ({len(present)}):** {', '.join(present)}")
-            st.write(f"**Absent ({len(absent)}):** {', '.join(absent)}")
-
+if ref_images:
+    added, updated, unchanged = roster.update([(file.name.split(".")[0], file.getvalue()) for file in ref_images])
+    if added or updated:
+        st.success(f"Roster updated: {len(added)} added, {len(updated)} changed, {len(unchanged)} unchanged.")
+
+st.info(f"{len(roster.names())} students in the {class_name} roster.")
+if roster.can_match_locally() and roster.faceless():
+    st.warning(f"No face was found in the reference photo of: {', '.join(roster.faceless())}. "
+               "They are checked by GPT-5 Vision instead of local matching; a clearer photo lets them be matched locally.")
+with st.expander("Manage roster"):
+    leaving = st.multiselect("Students to remove", roster.names())
+    if st.button("Remove selected") and leaving:
+        for name in leaving:
+            roster.remove(name)
+        st.rerun()
+
+mode = st.radio("Mode", ["Single image", "Batch"], horizontal=True)
+day = str(st.date_input("Date", date.today()))
+session = st.text_input("Session", "default")
+
+
+def show_summary(present, absent):
+    st.write(f"**Present ({len(present)}):** {', '.join(present)}")
+    st.write(f"**Absent ({len(absent)}):** {', '.join(absent)}")
+
+
+if mode == "Single image":
+    classroom_img = st.file_uploader("Upload classroom image", type=["jpg","jpeg","png"])
+
+    if classroom_img and roster.names():
+        st.image(classroom_img, caption="Classroom Image", use_column_width=True)
+
+        if st.button("Mark Attendance with GPT-5 Vision"):
+            data = classroom_img.getvalue()
+            with st.spinner("Analyzing image with GPT-5 Vision..."):
+                result = client.run(analyze(client, roster, data, day, OPENAI_API_KEY))
+
+            if result["output"] is not None:
+                st.subheader("📋 GPT-5 Output")
+                st.code(result["output"])
+                st.caption(f"Image upload reduced by {result['bytes_saved'] / 1024:.0f} KB")
+
+            if result["present"] is None:
+                st.error("⚠️ Could not parse model output as JSON. Check result above.")
+            else:
+                if ledger.record(class_key, content_hash(data), classroom_img.name, day, session, roster.names(), result["present"]):
+                    st.success("✅ Attendance recorded")
+                else:
+                    st.info("This photo was already recorded; the ledger was not changed.")
+                show_summary(result["present"], result["absent"])
+
+else:
+    # File names like 2024-05-01_morning.jpg override the date and session above
+    classroom_imgs = st.file_uploader("Upload classroom images", type=["jpg","jpeg","png"], accept_multiple_files=True)
+    folder = st.text_input("...or a folder of classroom images on the server", "")
+    workers = st.slider("Parallel workers", 1, 16, 4)
+
+    if st.button("Process batch") and roster.names():
+        images = [(f.name, f.getvalue()) for f in classroom_imgs or []]
+        if folder:
+            images += [(p.name, p.read_bytes()) for p in sorted(Path(folder).iterdir())
+                       if p.suffix.lower() in (".jpg", ".jpeg", ".png")]
+        batch = []
+        for name, data in images:
+            image_day, image_session = parse_filename(name, day, session)
+            batch.append({"name": name, "data": data, "day": image_day, "session": image_session})
+
+        # Workers run on the client's event loop; results come back through a queue
+        # so this script thread can update the page.
+        results = queue.Queue()
+        future = client.submit(run_batch(client, roster, ledger, class_key, batch, workers, OPENAI_API_KEY, results.put))
+        progress = st.progress(0.0, text="Processing...")
+        finished = 0
+        while not future.done() or not results.empty():
+            try:
+                result = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            finished += 1
+            progress.progress(min(1.0, finished / max(1, len(batch))), text=f"{result['name']} done")
+            if result["present"] is None:
+                st.warning(f"⚠️ {result['name']}: could not parse model output; it will be retried on the next run.")
+        summary = future.result()
+        progress.progress(1.0, text="Done")
+        st.success(
+            f"✅ {summary['processed']} processed, {summary['skipped']} already in the ledger, "
+            f"{summary['failed']} failed — {summary['images_per_minute']:.1f} images/min"
+        )
+
+# Reports are generated from the ledger on demand
+st.divider()
+st.subheader(f"📥 Attendance report – {class_name}")
+only_selected = st.checkbox("Only the selected date and session", value=True)
+report = ledger.to_dataframe(class_key, day, session) if only_selected else ledger.to_dataframe(class_key)
+st.dataframe(report, use_container_width=True)
+if not report.empty:
+    st.download_button(
+        "📥 Download Excel Report",
+        data=ledger.to_excel(class_key, day, session) if only_selected else ledger.to_excel(class_key),
+        file_name="attendance.xlsx",
+        mime="application/vnd.ms-excel"
+    )
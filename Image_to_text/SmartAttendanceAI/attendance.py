@@ -0,0 +1,75 @@
+# Attendance for one classroom photo, shared by the single-image and batch modes.
+import re
+import json
+import asyncio
+from datetime import date
+from pathlib import Path
+
+from shared.image_prep import prepare_image
+from shared.prompt_registry import get_prompt
+
+MODEL = "gpt-5-vision"
+# Batch files named like 2024-05-01_morning.jpg carry their own date and session
+FILENAME_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:_(.+))?$")
+
+PROMPT = get_prompt("attendance_vision")  # static instructions first, roster and date last
+
+
+def parse_filename(name, default_day, default_session):
+    match = FILENAME_PATTERN.match(Path(name).stem)
+    if not match:
+        return default_day, default_session
+    return match.group(1), match.group(2) or default_session
+
+def parse_output(output):
+    # Returns (present, absent), or None if the model did not return valid JSON
+    try:
+        result = json.loads(output)
+        return result.get("present", []), result.get("absent", [])
+    except (ValueError, AttributeError):
+        return None
+
+def model_names(roster):
+    # Students the model has to look for: everyone, or with local matching only
+    # those whose reference photo had no detectable face
+    return roster.faceless() if roster.can_match_locally() else roster.names()
+
+def prepare_sheets(roster, names=None):
+    # The roster sheets as prepared images; a batch builds these once and
+    # passes them to every analyze() call
+    return [prepare_image(sheet) for sheet in roster.roster_sheets(names)]
+
+async def analyze(client, roster, image_bytes, day=None, api_key=None, sheets=None):
+    # Returns {"present", "absent", "output", "bytes_saved"}; "present" is None
+    # when the model output could not be parsed.
+    names = roster.names()
+    pending = model_names(roster)
+    present = []
+    if roster.can_match_locally():
+        # Face encodings are cached, so no API call is needed for these students
+        present = await asyncio.to_thread(roster.match_local, image_bytes)
+        if not pending:
+            return {"present": present, "absent": [n for n in names if n not in present], "output": None, "bytes_saved": 0}
+
+    # Send the classroom photo plus the roster sheets of the students left
+    classroom = await asyncio.to_thread(prepare_image, image_bytes)
+    if sheets is None:
+        sheets = await asyncio.to_thread(prepare_sheets, roster, pending)
+    prompt = PROMPT.render(names=", ".join(pending), day=day or str(date.today()))
+    output = await client.chat(
+        model=MODEL,
+        messages=[{"role": "user", "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": classroom.data_uri},
+            *({"type": "image_url", "image_url": sheet.data_uri} for sheet in sheets),
+        ]}],
+        temperature=0.1,
+        api_key=api_key,
+        template=PROMPT
+    )
+    parsed = parse_output(output)
+    if parsed is None:
+        return {"present": None, "absent": None, "output": output, "bytes_saved": classroom.bytes_saved}
+    present = sorted(set(present) | {n for n in parsed[0] if n in pending})
+    return {"present": present, "absent": [n for n in names if n not in present], "output": output,
+            "bytes_saved": classroom.bytes_saved}
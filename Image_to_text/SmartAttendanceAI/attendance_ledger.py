@@ -0,0 +1,105 @@
+# Append-only attendance ledger in SQLite.
+#
+# Every processed classroom photo is recorded once per class, keyed by the
+# class and the SHA-256 of its bytes, together with one row per student. Rows
+# are only ever inserted, so re-runs skip photos already in the ledger, and
+# Excel reports are generated on demand from it.
+import io
+import sqlite3
+import hashlib
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+DEFAULT_CLASS = "default"  # class given to photos recorded before the ledger had classes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    class_name TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    image_name TEXT,
+    day TEXT,
+    session TEXT,
+    processed_at TEXT,
+    PRIMARY KEY (class_name, image_hash)
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    class_name TEXT NOT NULL,
+    image_hash TEXT,
+    day TEXT,
+    session TEXT,
+    student TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_attendance_class_day_session ON attendance (class_name, day, session);
+"""
+
+# Ledgers from before classes: the tables are rebuilt with every row in DEFAULT_CLASS
+ADD_CLASS = f"""
+BEGIN;
+ALTER TABLE images RENAME TO images_v1;
+ALTER TABLE attendance RENAME TO attendance_v1;
+DROP INDEX IF EXISTS ix_attendance_day_session;
+{SCHEMA}
+INSERT INTO images SELECT '{DEFAULT_CLASS}', image_hash, image_name, day, session, processed_at FROM images_v1;
+INSERT INTO attendance SELECT '{DEFAULT_CLASS}', image_hash, day, session, student, status FROM attendance_v1;
+DROP TABLE attendance_v1;
+DROP TABLE images_v1;
+COMMIT;
+"""
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class AttendanceLedger:
+    def __init__(self, path="attendance.db"):
+        self.path = str(path)
+        with closing(self._connect()) as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(images)")]
+            conn.executescript(ADD_CLASS if columns and "class_name" not in columns else SCHEMA)
+
+    def _connect(self):
+        # A short-lived connection per call, so batch workers on other threads can write safely
+        return sqlite3.connect(self.path, timeout=30)
+
+    def processed_hashes(self, class_name):
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT image_hash FROM images WHERE class_name = ?", (class_name,))}
+
+    def record(self, class_name, image_hash, image_name, day, session, students, present):
+        # Returns False if this photo was already recorded for this class
+        with closing(self._connect()) as conn, conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO images VALUES (?, ?, ?, ?, ?, ?)",
+                (class_name, image_hash, image_name, day, session, datetime.utcnow().isoformat()),
+            ).rowcount
+            if inserted:
+                conn.executemany(
+                    "INSERT INTO attendance VALUES (?, ?, ?, ?, ?, ?)",
+                    [(class_name, image_hash, day, session, s, "Present" if s in present else "Absent") for s in students],
+                )
+            return bool(inserted)
+
+    def to_dataframe(self, class_name=None, day=None, session=None):
+        query = ("SELECT class_name AS Class, day AS Date, session AS Session, student AS Student, status AS Attendance "
+                 "FROM attendance WHERE 1=1")
+        params = []
+        if class_name:
+            query += " AND class_name = ?"
+            params.append(class_name)
+        if day:
+            query += " AND day = ?"
+            params.append(day)
+        if session:
+            query += " AND session = ?"
+            params.append(session)
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query + " ORDER BY class_name, day, session, student", conn, params=params)
+
+    def to_excel(self, class_name=None, day=None, session=None):
+        buf = io.BytesIO()
+        self.to_dataframe(class_name, day, session).to_excel(buf, index=False)
+        return buf.getvalue()
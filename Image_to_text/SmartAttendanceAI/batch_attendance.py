@@ -0,0 +1,50 @@
+# Batch mode: many classroom photos processed concurrently into the ledger.
+import time
+import asyncio
+
+from attendance import analyze, prepare_sheets, model_names
+from attendance_ledger import content_hash
+
+
+async def run_batch(client, roster, ledger, class_name, images, workers=4, api_key=None, on_result=None):
+    # `images` are dicts with "name", "data", "day" and "session". Photos whose
+    # content hash is already in the ledger for `class_name` are skipped.
+    # `on_result(result)` is called as each photo finishes. Returns a summary dict.
+    start = time.perf_counter()
+    students = roster.names()
+    done = ledger.processed_hashes(class_name)
+    # Built once up front rather than by every worker
+    pending = model_names(roster)
+    sheets = await asyncio.to_thread(prepare_sheets, roster, pending) if pending else None
+    semaphore = asyncio.Semaphore(workers)
+    summary = {"processed": 0, "skipped": 0, "failed": 0}
+
+    pending, seen = [], set()
+    for image in images:
+        image["hash"] = content_hash(image["data"])
+        if image["hash"] in done or image["hash"] in seen:
+            summary["skipped"] += 1
+        else:
+            seen.add(image["hash"])
+            pending.append(image)
+
+    async def process(image):
+        async with semaphore:
+            try:
+                result = await analyze(client, roster, image["data"], image["day"], api_key, sheets)
+            except Exception as exc:
+                result = {"present": None, "output": str(exc)}
+        result.update(name=image["name"], day=image["day"], session=image["session"])
+        if result["present"] is None:
+            summary["failed"] += 1  # not recorded, so a re-run retries it
+        else:
+            await asyncio.to_thread(ledger.record, class_name, image["hash"], image["name"], image["day"],
+                                    image["session"], students, result["present"])
+            summary["processed"] += 1
+        if on_result is not None:
+            on_result(result)
+
+    await asyncio.gather(*(process(image) for image in pending))
+    summary["seconds"] = time.perf_counter() - start
+    summary["images_per_minute"] = 60 * summary["processed"] / summary["seconds"] if summary["seconds"] else 0.0
+    return summary
@@ -0,0 +1,215 @@
+# Persistent index of student reference photos, one per class.
+#
+# Each reference photo is processed once into a small thumbnail (and, when the
+# optional `face_recognition` package is installed, a 128-d face encoding).
+# Photos are keyed by content hash, so re-uploading an unchanged photo is free.
+# A run then sends the classroom image plus the roster sheets, or matches faces
+# locally with no API call at all; students whose photo had no detectable face
+# are still checked by the model, against sheets of just those students.
+#
+# Sheets hold at most SHEET_COLUMNS x SHEET_ROWS students at TILE_SIZE pixels,
+# sized so image preparation sends them unscaled: a class of 32 fits one sheet,
+# 200 students take 7. More sheets cost more image tokens per request, but one
+# sheet for the whole class would be shrunk until faces are ~50px and names
+# unreadable, which costs accuracy instead.
+import io
+import os
+import json
+import math
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+try:
+    import numpy as np
+    import face_recognition
+except ImportError:
+    face_recognition = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: index writes are atomic but not serialized across sessions
+    fcntl = None
+
+THUMB_SIZE = 256
+TILE_SIZE = 160
+LABEL_HEIGHT = 24
+SHEET_COLUMNS = 8
+SHEET_ROWS = 4  # 8 x 4 tiles of 160 + 24 px = 1280 x 736, under the 768 px short side
+
+
+class RosterIndex:
+    def __init__(self, path="roster"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index_file = self.path / "index.json"
+        self.entries = self._load()
+        self._encodings = None
+        self._sheets = None
+        self._subset_sheets = {}  # tuple of names -> sheets, for rosters smaller than the class
+        self._lock = threading.Lock()  # guards the sheet files and cached derived data
+
+    def names(self):
+        return sorted(self.entries)
+
+    def faceless(self):
+        # Students whose reference photo had no detectable face, so local
+        # matching can't find them
+        return sorted(n for n, e in self.entries.items() if not e["encoding"])
+
+    def _load(self):
+        return json.loads(self._index_file.read_text()) if self._index_file.exists() else {}
+
+    @contextmanager
+    def _index_lock(self):
+        # Held while reading, changing and writing index.json, so sessions
+        # updating the same roster at once don't lose each other's changes
+        with open(self.path / "index.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _thumb_path(self, name):
+        return self.path / f"{hashlib.sha1(name.encode('utf-8')).hexdigest()}.jpg"
+
+    def update(self, files):
+        # `files` are (name, bytes) pairs. Returns (added, updated, unchanged) names.
+        added, updated, unchanged = [], [], []
+        changed = {}
+        for name, data in files:
+            digest = hashlib.sha256(data).hexdigest()
+            entry = self.entries.get(name)
+            if entry is not None and entry["hash"] == digest:
+                unchanged.append(name)
+                continue
+
+            img = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+            encoding = None
+            if face_recognition is not None:
+                pixels = np.asarray(img)
+                boxes = face_recognition.face_locations(pixels)
+                if boxes:
+                    top, right, bottom, left = boxes[0]
+                    encoding = face_recognition.face_encodings(pixels, [boxes[0]])[0].tolist()
+                    # Crop to the face with some margin so the thumbnail is mostly face
+                    pad = (bottom - top) // 2
+                    img = img.crop((max(0, left - pad), max(0, top - pad), min(img.width, right + pad), min(img.height, bottom + pad)))
+            img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=85)
+            self._write(self._thumb_path(name), buf.getvalue())
+
+            (updated if entry is not None else added).append(name)
+            changed[name] = {"hash": digest, "encoding": encoding}
+
+        if changed:
+            # Merged into the index as it is on disk now, not as it was loaded
+            with self._index_lock():
+                self.entries = self._load()
+                self.entries.update(changed)
+                self._save()
+        return added, updated, unchanged
+
+    def remove(self, name):
+        with self._index_lock():
+            self.entries = self._load()
+            if self.entries.pop(name, None) is not None:
+                self._thumb_path(name).unlink(missing_ok=True)
+                self._save()
+
+    def _save(self):
+        # Called with the index lock held
+        self._write(self._index_file, json.dumps(self.entries).encode("utf-8"))
+        # Derived artifacts are rebuilt lazily on next use
+        with self._lock:
+            for sheet in self.path.glob("sheet*.jpg"):
+                sheet.unlink(missing_ok=True)
+            self._sheets = None
+            self._subset_sheets = {}
+            self._encodings = None
+
+    def _write(self, path, data):
+        # Readers only ever see a complete file
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def roster_sheets(self, names=None):
+        # Labelled grids of the reference faces, SHEET_COLUMNS x SHEET_ROWS per
+        # sheet, as JPEG bytes. The whole class's sheets are built once and
+        # cached on disk, a subset's (`names`) in memory; concurrent callers
+        # wait for the first build instead of racing it.
+        with self._lock:
+            if names is None or list(names) == self.names():
+                if self._sheets is None:
+                    self._sheets = self._load_or_build_sheets(self.names(), "sheet")
+                return self._sheets
+            key = tuple(sorted(names))
+            if key not in self._subset_sheets:
+                self._subset_sheets[key] = self._load_or_build_sheets(list(key), None)
+            return self._subset_sheets[key]
+
+    def _load_or_build_sheets(self, names, prefix):
+        # Sheets are written to <prefix>N.jpg, or only kept in memory without a prefix
+        per_sheet = SHEET_COLUMNS * SHEET_ROWS
+        count = max(1, math.ceil(len(names) / per_sheet))
+        files = [self.path / f"{prefix}{i + 1}.jpg" if prefix else None for i in range(count)]
+        if prefix and all(f.exists() for f in files):
+            return [f.read_bytes() for f in files]
+
+        font = _label_font()
+        sheets = []
+        for file, start in zip(files, range(0, max(1, len(names)), per_sheet)):
+            chunk = names[start:start + per_sheet]
+            rows = max(1, math.ceil(len(chunk) / SHEET_COLUMNS))
+            sheet = Image.new("RGB", (SHEET_COLUMNS * TILE_SIZE, rows * (TILE_SIZE + LABEL_HEIGHT)), "white")
+            draw = ImageDraw.Draw(sheet)
+            for i, name in enumerate(chunk):
+                x, y = (i % SHEET_COLUMNS) * TILE_SIZE, (i // SHEET_COLUMNS) * (TILE_SIZE + LABEL_HEIGHT)
+                thumb = Image.open(self._thumb_path(name))
+                thumb.thumbnail((TILE_SIZE, TILE_SIZE))
+                sheet.paste(thumb, (x + (TILE_SIZE - thumb.width) // 2, y + (TILE_SIZE - thumb.height) // 2))
+                draw.text((x + 2, y + TILE_SIZE + 2), name, fill="black", font=font)
+
+            buf = io.BytesIO()
+            sheet.save(buf, "JPEG", quality=85)
+            if file is not None:
+                self._write(file, buf.getvalue())
+            sheets.append(buf.getvalue())
+        return sheets
+
+    def can_match_locally(self):
+        # True if any student can be matched locally; see faceless() for the rest
+        return face_recognition is not None and any(e["encoding"] for e in self.entries.values())
+
+    def match_local(self, classroom_bytes, tolerance=0.6):
+        # Returns the names whose cached face encoding matches a face in the classroom photo
+        with self._lock:
+            if self._encodings is None:
+                known = [(n, e["encoding"]) for n, e in sorted(self.entries.items()) if e["encoding"]]
+                self._encodings = ([n for n, _ in known], np.array([enc for _, enc in known]))
+            names, known = self._encodings
+
+        pixels = np.asarray(ImageOps.exif_transpose(Image.open(io.BytesIO(classroom_bytes))).convert("RGB"))
+        present = set()
+        for face in face_recognition.face_encodings(pixels):
+            distances = np.linalg.norm(known - face, axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] <= tolerance:
+                present.add(names[best])
+        return sorted(present)
+
+
+def _label_font(size=14):
+    # Scalable default font on Pillow 10.1+, the small bitmap one before that
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
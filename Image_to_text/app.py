@@ -1,8 +1,14 @@
 import streamlit as st
-from openai import OpenAI
-import base64
+import sys
+from pathlib import Path
 
-client = OpenAI()
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from shared.image_prep import prepare_image
+from shared.prompt_registry import get_prompt
+
+client = get_client()
+DERMATOLOGY_PROMPT = get_prompt("dermatology_system")
 
 st.title("AI-Powered Dermatology Assistant 🧑‍⚕️")
 
@@ -13,24 +19,25 @@ if uploaded_file is not None:
 
     if st.button("Analyze"):
         with st.spinner("Analyzing image... ⏳"):
-            # Convert to base64
-            file_bytes = uploaded_file.read()
-            base64_image = base64.b64encode(file_bytes).decode("utf-8")
+            # Downscale and recompress before upload
+            image = prepare_image(uploaded_file)
 
-            response = client.chat.completions.create(
+            answer = client.run(client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a dermatologist assistant. Analyze the image and suggest possible conditions (not a medical diagnosis)."
+                        "content": DERMATOLOGY_PROMPT.render()
                     },
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": "Please analyze this image."},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                            {"type": "image_url", "image_url": {"url": image.data_uri}}
                         ]
                     }
-                ]
-            )
-            st.success(response.choices[0].message.content)
+                ],
+                template=DERMATOLOGY_PROMPT
+            ))
+            st.success(answer)
+            st.caption(f"Uploaded {len(image.data) / 1024:.0f} KB ({image.bytes_saved / 1024:.0f} KB saved)")
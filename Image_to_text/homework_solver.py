@@ -0,0 +1,146 @@
+# Solves homework photos, one or many at a time, reusing the solution for
+# photos that look the same as one already solved (the same worksheet uploaded
+# by a whole class, re-saved or re-compressed on the way).
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+from shared.image_prep import prepare_image, fingerprint
+from shared.prompt_registry import get_prompt
+
+MODEL = "gpt-4o-mini"
+TUTOR_PROMPT = get_prompt("homework_tutor_system")
+USER_TEXT = "Please solve this math problem with detailed steps and proper formulas."
+
+
+class SolutionCache:
+    # LRU of (fingerprint, solution). Lookups scan the perceptual hashes, which
+    # costs microseconds for a few hundred entries, and only decode thumbnails
+    # of the close candidates.
+    def __init__(self, maxsize=500):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # sha256 -> (fingerprint, solution)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fp, count=True):
+        # `count=False` leaves the hit/miss stats to the caller, via record()
+        with self._lock:
+            entry = self._entries.get(fp.sha256)
+            candidates = [entry] if entry else list(self._entries.values())
+        for other, solution in candidates:
+            if fp.matches(other):
+                with self._lock:
+                    self.hits += count
+                    if other.sha256 in self._entries:
+                        self._entries.move_to_end(other.sha256)
+                return solution
+        with self._lock:
+            self.misses += count
+        return None
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, fp, solution):
+        with self._lock:
+            self._entries[fp.sha256] = (fp, solution)
+            self._entries.move_to_end(fp.sha256)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+async def solve(client, data):
+    # One photo, always sent to the model. Returns {"solution", "bytes_saved"}.
+    image = await asyncio.to_thread(prepare_image, data)
+    solution = await client.chat(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": TUTOR_PROMPT.render()},
+            {"role": "user", "content": [
+                {"type": "text", "text": USER_TEXT},
+                {"type": "image_url", "image_url": {"url": image.data_uri}},
+            ]},
+        ],
+        template=TUTOR_PROMPT
+    )
+    return {"solution": solution, "bytes_saved": image.bytes_saved}
+
+
+async def solve_cached(client, cache, data):
+    # One photo through the cache. Returns {"solution", "cached", "bytes_saved"}.
+    fp = await asyncio.to_thread(fingerprint, data)
+    solution = await asyncio.to_thread(cache.get, fp)
+    if solution is not None:
+        return {"solution": solution, "cached": True, "bytes_saved": 0}
+    result = await solve(client, data)
+    cache.put(fp, result["solution"])
+    return {**result, "cached": False}
+
+
+async def solve_batch(client, cache, uploads, workers=4, on_result=None):
+    # `uploads` are (name, bytes) pairs. At most `workers` photos are with the
+    # model at once; look-alike photos within the batch are solved once.
+    # `on_result(result)` is called as each photo finishes. Returns a summary.
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(workers)
+    in_flight = []  # (fingerprint, future) of photos being solved in this batch
+    summary = {"problems": len(uploads), "solved": 0, "cached": 0, "failed": 0}
+
+    async def process(name, data):
+        result = {"name": name, "solution": None, "cached": False, "error": None}
+        try:
+            fp = await asyncio.to_thread(fingerprint, data)
+            solution = await asyncio.to_thread(cache.get, fp, False)
+            if solution is None:
+                # Register before scanning, and scan only the photos registered
+                # earlier, so of two copies the later one always waits for the
+                # first. The scan may decode thumbnails, so it runs off the loop.
+                earlier = list(in_flight)
+                future = asyncio.get_running_loop().create_future()
+                in_flight.append((fp, future))
+                try:
+                    twin = await asyncio.to_thread(lambda: next((f for other, f in earlier if fp.matches(other)), None))
+                    cache.record(twin is not None)
+                    if twin is not None:
+                        solution = await asyncio.shield(twin)
+                    else:
+                        async with semaphore:
+                            solution = (await solve(client, data))["solution"]
+                        cache.put(fp, solution)
+                        summary["solved"] += 1
+                        result["solution"] = solution
+                    future.set_result(solution)
+                except Exception as exc:
+                    future.set_exception(exc)
+                    future.exception()  # mark retrieved when no twin is waiting
+                    raise
+            else:
+                cache.record(True)
+            if result["solution"] is None:
+                result.update(solution=solution, cached=True)
+                summary["cached"] += 1
+        except Exception as exc:
+            result["error"] = str(exc)
+            summary["failed"] += 1
+        if on_result is not None:
+            on_result(result)
+
+    await asyncio.gather(*(process(name, data) for name, data in uploads))
+    summary["seconds"] = time.perf_counter() - start
+    done = summary["solved"] + summary["cached"]
+    summary["problems_per_minute"] = 60 * done / summary["seconds"] if summary["seconds"] else 0.0
+    summary["hit_rate"] = summary["cached"] / done if done else 0.0
+    return summary
@@ -3,12 +3,23 @@ import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
 from dotenv import load_dotenv
+import copy
 import os
+import sys
+import time
+from pathlib import Path
 
-# --- Optional helper imports (keep or remove based on your project) ---
-from gpt_service import get_gpt_response
-from db_service import save_message, init_db, mark_order_paid
-from billing_service import create_razorpay_order
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.telemetry import get_telemetry, serve_metrics
+# gpt_service, db_service, cache_service and billing_service pull in openai,
+# tiktoken, SQLAlchemy and razorpay (over a second of imports); they are
+# imported after login, so the login page renders without them.
+
+# The working directory's config wins, as before; otherwise the one next to app.py
+AUTH_CONFIG_PATH = next(
+    (p for p in (Path("auth_config.yaml").resolve(), Path(__file__).resolve().with_name("auth_config.yaml")) if p.exists()),
+    Path(__file__).resolve().with_name("auth_config.yaml"),
+)
 
 
 # ----------------------------------------------------------
@@ -16,18 +27,50 @@ from billing_service import create_razorpay_order
 # ----------------------------------------------------------
 st.set_page_config(page_title="AI Personal Assistant", page_icon="🤖", layout="wide")
 load_dotenv()
-init_db()
+telemetry = get_telemetry()
+telemetry.count("app_reruns_total")
+serve_metrics()  # Prometheus text on METRICS_PORT, if set; started once per process
 
 APP_URL = os.getenv("APP_URL", "http://localhost:8501")
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 
 
+# Process-wide resources, created on first use and shared by every rerun and
+# session. Streamlit re-executes this script on each interaction, so anything
+# built at top level would otherwise be rebuilt every time.
+@st.cache_resource
+def init_database():
+    # Schema check (a create_all round trip per table) once per process
+    from db_service import init_db
+    with telemetry.span("app_init_db"):
+        init_db()
+
+@st.cache_resource
+def load_auth_config(path, mtime):
+    # Parsed once per version of the file; `mtime` is only part of the cache key
+    with open(path) as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+# One response cache per process, shared by all sessions
+@st.cache_resource
+def get_response_cache():
+    from cache_service import ResponseCache, MemoryBackend, SQLBackend
+    backend = SQLBackend() if os.getenv("RESPONSE_CACHE_BACKEND") == "sql" else MemoryBackend()
+    cache = ResponseCache(
+        backend=backend,
+        ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        semantic=os.getenv("RESPONSE_CACHE_SEMANTIC") == "1",
+    )
+    telemetry.register_collector(lambda: [(f"response_cache_{k}", {}, v) for k, v in cache.stats().items()])
+    return cache
+
+
 # ----------------------------------------------------------
 # 2️⃣  Load authentication YAML
 # ----------------------------------------------------------
 try:
-    with open("auth_config.yaml") as f:
-        config = yaml.load(f, Loader=SafeLoader)
+    # Copied per run: the authenticator records login state in the credentials
+    config = copy.deepcopy(load_auth_config(str(AUTH_CONFIG_PATH), AUTH_CONFIG_PATH.stat().st_mtime))
 except FileNotFoundError:
     st.error("❌ 'auth_config.yaml' not found — upload it in the same folder as app.py.")
     st.stop()
@@ -36,12 +79,16 @@ except FileNotFoundError:
 # ----------------------------------------------------------
 # 3️⃣  Initialize Authenticator (for v0.3.3+)
 # ----------------------------------------------------------
+# Rebuilt each run (it is cheap once the config is parsed): its cookie manager
+# is a component that has to render on every run to read the login cookie.
 authenticator = stauth.Authenticate(
     config["credentials"],
     config["cookie"]["name"],
     config["cookie"]["key"],
     config["cookie"]["expiry_days"],
-    config["preauthorized"]
+    # The repo-root config calls this section `preauthorized`, the one in
+    # LLM_applications `pre_authorization`; either may be left out
+    config.get("preauthorized", config.get("pre_authorization")) or {}
 )
 
 
@@ -51,7 +98,8 @@ authenticator = stauth.Authenticate(
 st.title("🤖 AI Personal Assistant Login")
 
 try:
-    name, auth_status, username = authenticator.login(location="main")
+    with telemetry.span("app_login"):
+        name, auth_status, username = authenticator.login(location="main")
 except Exception as e:
     st.error(f"⚠️ Login error: {e}")
     st.stop()
@@ -73,34 +121,84 @@ with st.expander("🆕 New User? Register Here"):
 # 5️⃣  If logged in successfully
 # ----------------------------------------------------------
 if auth_status:
+    from gpt_service import stream_gpt_response, ConversationWindow
+    from db_service import queue_message, get_history, confirm_payment
+    from billing_service import get_checkout_order, forget_checkout_order, verify_payment
+    from scheduler import get_scheduler, QuotaExceeded
+    init_database()
+    response_cache = get_response_cache()
+    plan = get_scheduler().plan_for(username)
+
     st.sidebar.success(f"Welcome {name} 👋")
+    st.sidebar.caption(f"Plan: {plan.title()}")
     authenticator.logout("Logout", location="sidebar")
 
     st.header("💬 Chat with Your AI Assistant")
 
-    if "history" not in st.session_state:
-        st.session_state.history = []
+    if st.session_state.get("history_user") != username:
+        # Restore the most recent page of the conversation after login
+        recent, cursor = get_history(username, limit=20)
+        st.session_state.history = [{"role": m["role"], "content": m["content"]} for m in recent]
+        st.session_state.older = []  # display only, not sent to the model
+        st.session_state.history_cursor = cursor
+        st.session_state.history_user = username
+        st.session_state.window = ConversationWindow()
+
+    if st.session_state.history_cursor is not None and st.button("Load older messages"):
+        page, st.session_state.history_cursor = get_history(username, before=st.session_state.history_cursor, limit=50)
+        st.session_state.older = [{"role": m["role"], "content": m["content"]} for m in page] + st.session_state.older
+
+    for message in st.session_state.older + st.session_state.history:
+        st.chat_message(message["role"]).markdown(message["content"])
 
     user_prompt = st.chat_input("Ask me anything...")
     if user_prompt:
+        turn_started = time.perf_counter()
         st.chat_message("user").markdown(user_prompt)
+        # Only the recent turns plus a summary of older ones are sent to the model
+        try:
+            context = st.session_state.window.build(st.session_state.history, username=username)
+        except QuotaExceeded as e:
+            st.warning(f"⏳ {e} Upgrade to Pro for higher limits.")
+            st.stop()
         st.session_state.history.append({"role": "user", "content": user_prompt})
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                reply = get_gpt_response(user_prompt, st.session_state.history)
+            with telemetry.span("response_cache_lookup"):
+                reply = response_cache.get(user_prompt, context)
+            source = "cache" if reply is not None else "model"
+            if reply is not None:
                 st.markdown(reply)
+            else:
+                # Render tokens as they arrive instead of waiting for the full reply
+                timings = {}
+                try:
+                    reply = st.write_stream(stream_gpt_response(user_prompt, context, timings=timings, username=username))
+                except QuotaExceeded as e:
+                    st.session_state.history.pop()  # unanswered, so not part of the conversation
+                    st.warning(f"⏳ {e} Upgrade to Pro for higher limits.")
+                    st.stop()
+                st.session_state.last_timings = timings
+                response_cache.put(user_prompt, reply, context, latency=timings.get("total"))
 
         st.session_state.history.append({"role": "assistant", "content": reply})
-        save_message(username, "user", user_prompt)
-        save_message(username, "assistant", reply)
+        # Persisted in the background in batches, off the request path
+        queue_message(username, "user", user_prompt)
+        queue_message(username, "assistant", reply)
+        telemetry.observe("app_chat_turn_seconds", time.perf_counter() - turn_started, source=source)
+
+    window = st.session_state.window
+    st.sidebar.caption(f"Prompt tokens saved: {window.tokens_saved} last request, {window.total_tokens_saved} total")
+    cache_stats = response_cache.stats()
+    st.sidebar.caption(f"Response cache hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats['hits'] + cache_stats['semantic_hits']} hits, {cache_stats['misses']} misses)")
 
     st.divider()
     st.subheader("💳 Upgrade to Pro Plan")
     st.write("Unlock higher limits and priority access.")
 
     if st.button("Proceed to Payment"):
-        order = create_razorpay_order(username)
+        # The user's open order if there is one, otherwise created now
+        order = get_checkout_order(username)
         st.session_state.razorpay_order = order
         st.experimental_rerun()
 
@@ -119,7 +217,15 @@ if auth_status:
             "name": "AI Assistant Pro",
             "description": "Pro Plan Access",
             "order_id": "{order['id']}",
-            "callback_url": "{APP_URL}?payment_status=paid&order_id={order['id']}",
+            "handler": function(response) {{
+                // Back to the app with the signed checkout response, verified server-side
+                var params = new URLSearchParams({{
+                    razorpay_payment_id: response.razorpay_payment_id,
+                    razorpay_order_id: response.razorpay_order_id,
+                    razorpay_signature: response.razorpay_signature
+                }});
+                window.top.location.href = "{APP_URL}?" + params.toString();
+            }},
             "theme": {{"color": "#3399cc"}}
         }};
         var rzp1 = new Razorpay(options);
@@ -128,12 +234,27 @@ if auth_status:
         """
         st.components.v1.html(checkout_html, height=220)
 
-    # Payment success callback
+    # Payment success callback, trusted only with a valid Razorpay signature on
+    # one of this user's orders
     qs = st.query_params
-    if qs.get("payment_status") == ["paid"] and "order_id" in qs:
-        order_id = qs["order_id"][0] if isinstance(qs["order_id"], list) else qs["order_id"]
-        mark_order_paid(order_id)
-        st.success("✅ Payment successful! You’re now on the Pro plan.")
+    order_id = qs.get("razorpay_order_id")
+    if order_id:
+        confirmed = st.session_state.setdefault("confirmed_orders", {})
+        if order_id not in confirmed and not verify_payment(
+                username, order_id, qs.get("razorpay_payment_id"), qs.get("razorpay_signature")):
+            st.error("❌ This payment could not be verified.")
+            st.stop()
+        if order_id not in confirmed:
+            # Settled in one transaction with other confirmations arriving at the
+            # same time; a repeated confirmation changes nothing
+            confirmed[order_id] = confirm_payment(order_id).result(timeout=30)
+            forget_checkout_order(username)
+            get_scheduler().invalidate(username)
+            st.session_state.pop("razorpay_order", None)
+        if confirmed[order_id]:
+            st.success("✅ Payment successful! You’re now on the Pro plan.")
+        else:
+            st.info("This payment was already recorded.")
 
 
 # ----------------------------------------------------------
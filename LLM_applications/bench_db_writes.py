@@ -0,0 +1,33 @@
+# Compare message persistence throughput: one commit per row (save_message)
+# against the write-behind queue (queue_message). Uses a throwaway SQLite file
+# unless DATABASE_URL is already set.
+#   python bench_db_writes.py 5000
+import os
+import sys
+import time
+import tempfile
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from db_service import init_db, save_message, MessageWriter
+
+def bench_per_row(rows):
+    start = time.perf_counter()
+    for i in range(rows):
+        save_message("bench", "user", f"message {i}")
+    return rows / (time.perf_counter() - start)
+
+def bench_queued(rows):
+    writer = MessageWriter()
+    start = time.perf_counter()
+    for i in range(rows):
+        writer.enqueue("bench", "user", f"message {i}")
+    writer.close()
+    return rows / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    init_db()
+    print(f"per-row commit  {bench_per_row(rows):10.0f} rows/sec")
+    print(f"write-behind    {bench_queued(rows):10.0f} rows/sec")
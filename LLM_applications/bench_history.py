@@ -0,0 +1,41 @@
+# Measure cold-start history load (first page of get_history) as a user's
+# message count grows. Uses a throwaway SQLite file unless DATABASE_URL is set.
+#   python bench_history.py 1000 10000 100000
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import insert
+from db_service import init_db, engine, Message, get_history
+
+def grow_to(username, current, target):
+    base = datetime(2024, 1, 1)
+    rows = [
+        {"username": username, "role": "user", "content": f"message {i}", "created_at": base + timedelta(seconds=i)}
+        for i in range(current, target)
+    ]
+    with engine.begin() as conn:
+        for i in range(0, len(rows), 10000):
+            conn.execute(insert(Message), rows[i:i + 10000])
+
+def time_first_page(username, runs=20):
+    start = time.perf_counter()
+    for _ in range(runs):
+        get_history(username, limit=50)
+    return (time.perf_counter() - start) / runs
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    init_db()
+    # Another user's messages in the same table, so the filter has work to do
+    grow_to("someone_else", 0, max(sizes))
+    count = 0
+    for size in sorted(sizes):
+        grow_to("bench", count, size)
+        count = size
+        print(f"{size:>8} messages  first page {time_first_page('bench') * 1000:7.2f} ms")
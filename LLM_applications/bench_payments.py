@@ -0,0 +1,74 @@
+# Checkout and payment confirmation cost, against the fake Razorpay API and a
+# throwaway SQLite file (unless DATABASE_URL is set):
+# - checkout click: creating a Razorpay order on every click against reusing
+#   the user's open order after their first click
+# - confirmations: one transaction per payment callback (mark_order_paid)
+#   against the batching reconciler (confirm_payment), with concurrent callbacks
+#   counting database statements and commits per payment
+#   python bench_payments.py 200
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from benchmarks.run import fake_server, _configure, _percentiles
+
+
+def count_round_trips(engine):
+    counts = {"statements": 0, "commits": 0}
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def statement(*args):
+        counts["statements"] += 1
+
+    @event.listens_for(engine, "commit")
+    def commit(*args):
+        counts["commits"] += 1
+    return counts
+
+def timed(fn, items, concurrency=1):
+    latencies = []
+
+    def one(item):
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, items))
+    return _percentiles(latencies)
+
+def confirmations(label, confirm, order_ids, counts):
+    before = dict(counts)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(confirm, order_ids))
+    seconds = time.perf_counter() - start
+    statements = (counts["statements"] - before["statements"]) / len(order_ids)
+    commits = (counts["commits"] - before["commits"]) / len(order_ids)
+    print(f"{label:<34}{len(order_ids) / seconds:>8.0f}/s  {statements:5.2f} statements  {commits:5.2f} commits per payment")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with fake_server(1.0, 0.0) as url, tempfile.TemporaryDirectory() as workdir:
+        _configure(url, workdir)
+        from db_service import init_db, engine, mark_order_paid, confirm_payment
+        from billing_service import create_razorpay_order, get_checkout_order
+        init_db()
+        create_razorpay_order("warm-up")
+
+        # Checkout clicks, 10 users clicking 5 times each
+        clicks = [f"user{i % 10}" for i in range(50)]
+        pct = timed(lambda user: create_razorpay_order("old-" + user), clicks)
+        print(f"{'checkout, order per click':<34}p50 {pct['p50_ms']:7.1f} ms  p95 {pct['p95_ms']:7.1f} ms")
+        pct = timed(get_checkout_order, clicks)
+        print(f"{'checkout, open order reused':<34}p50 {pct['p50_ms']:7.3f} ms  p95 {pct['p95_ms']:7.3f} ms")
+
+        # Payment confirmations, 16 callbacks at a time
+        orders = [create_razorpay_order(f"payer{i}")["id"] for i in range(2 * n)]
+        counts = count_round_trips(engine)
+        confirmations("confirm, transaction per payment", mark_order_paid, orders[:n], counts)
+        confirmations("confirm, batched reconciler", lambda o: confirm_payment(o).result(), orders[n:], counts)
@@ -0,0 +1,87 @@
+# Pro latency under free-tier load. Starts the fake OpenAI server, caps LLM
+# concurrency so the upstream saturates, and runs chat users in closed loops
+# (send, wait for the reply, think, repeat) three ways:
+# - Pro users alone
+# - Pro and free users through the LLM client's own limit only
+# - Pro and free users through the priority scheduler with plan quotas
+# Throttled requests back off for the Retry-After the scheduler reports.
+#   python bench_priority.py --seconds 40 --pro-users 4 --free-users 64 --slots 8
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from benchmarks.run import fake_server, _configure, _percentiles
+
+
+def run(users, slots, seconds, think, scheduler=None):
+    from gpt_service import get_gpt_response
+    from scheduler import QuotaExceeded
+
+    latencies = {"pro": [], "free": []}
+    throttled = {"pro": 0, "free": 0}
+    deadline = time.monotonic() + seconds
+
+    def user(name):
+        plan = name.split("-")[0]
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                if scheduler is None:
+                    get_gpt_response("How do I reset my net banking password?")
+                else:
+                    with scheduler.slot(name):
+                        get_gpt_response("How do I reset my net banking password?")
+            except QuotaExceeded as e:
+                throttled[plan] += 1
+                time.sleep(min(e.retry_after, max(0.0, deadline - time.monotonic())))
+                continue
+            latencies[plan].append(time.perf_counter() - start)
+            time.sleep(think)
+
+    threads = [threading.Thread(target=user, args=(name,)) for name in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, throttled
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=40)
+    parser.add_argument("--pro-users", type=int, default=4)
+    parser.add_argument("--free-users", type=int, default=64)
+    parser.add_argument("--slots", type=int, default=8, help="concurrent LLM requests upstream allows")
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between a reply and the user's next message")
+    parser.add_argument("--latency", type=float, default=1.0, help="multiplier for the fake server's latencies")
+    args = parser.parse_args()
+
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.slots)
+    pro = [f"pro-{i}" for i in range(args.pro_users)]
+    free = [f"free-{i}" for i in range(args.free_users)]
+    with fake_server(args.latency, 0.0) as url, tempfile.TemporaryDirectory() as workdir:
+        _configure(url, workdir)
+        from scheduler import PriorityScheduler
+        from gpt_service import get_gpt_response
+        get_gpt_response("warm-up")  # imports and connection setup
+
+        def scheduler():
+            return PriorityScheduler(max_concurrency=args.slots, plan_lookup=lambda name: name.split("-")[0])
+
+        runs = [
+            ("pro only", run(pro, args.slots, args.seconds, args.think, scheduler())),
+            ("no scheduler", run(pro + free, args.slots, args.seconds, args.think)),
+            ("scheduler", run(pro + free, args.slots, args.seconds, args.think, scheduler())),
+        ]
+
+    print(f"{'run':<14}{'plan':<6}{'ok':>7}{'throttled':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, (latencies, throttled) in runs:
+        for plan in ("pro", "free"):
+            if latencies[plan] or throttled[plan]:
+                pct = _percentiles(latencies[plan])
+                print(f"{name:<14}{plan:<6}{len(latencies[plan]):>7}{throttled[plan]:>11}"
+                      f"{pct['p50_ms']:>10.1f}{pct['p95_ms']:>10.1f}{pct['p99_ms']:>10.1f}")
@@ -0,0 +1,66 @@
+# Compare the assistant's startup work before and after the one-time resource
+# setup in app.py:
+# - cold start: importing every service module up front (as app.py used to)
+#   against only what the login page needs, each in a fresh interpreter
+# - per rerun: re-reading auth_config.yaml and running init_db() on every
+#   script run against reusing the parsed config and the checked schema
+# Uses a throwaway SQLite file unless DATABASE_URL is set; against a remote
+# Postgres the init_db() line grows by a network round trip per table.
+#   python bench_startup.py 20
+import os
+import sys
+import copy
+import time
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import yaml
+from yaml.loader import SafeLoader
+
+APP_DIR = Path(__file__).resolve().parent
+AUTH_CONFIG_PATH = APP_DIR / "auth_config.yaml"
+LOGIN_PAGE = ["yaml", "dotenv", "streamlit", "streamlit_authenticator", "shared.telemetry"]
+SERVICES = ["gpt_service", "db_service", "cache_service", "billing_service", "razorpay"]
+
+def import_seconds(modules):
+    # Median over fresh interpreters; modules that aren't installed are skipped
+    code = ("import sys, time; sys.path[:0] = [%r, %r]; start = time.perf_counter()\n"
+            "for m in sys.argv[1:]:\n"
+            "    try: __import__(m)\n"
+            "    except ImportError: pass\n"
+            "print(time.perf_counter() - start)") % (str(APP_DIR), str(APP_DIR.parent))
+    runs = [float(subprocess.run([sys.executable, "-c", code, *modules], capture_output=True,
+                                 text=True, check=True).stdout) for _ in range(5)]
+    return statistics.median(runs)
+
+def per_rerun_seconds(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    eager = import_seconds(LOGIN_PAGE + SERVICES)
+    lazy = import_seconds(LOGIN_PAGE)
+    print(f"cold start, all services imported  {eager * 1000:8.1f} ms")
+    print(f"cold start, login page only        {lazy * 1000:8.1f} ms")
+
+    from db_service import init_db
+    init_db()
+
+    def every_run():
+        with open(AUTH_CONFIG_PATH) as f:
+            yaml.load(f, Loader=SafeLoader)
+        init_db()
+
+    with open(AUTH_CONFIG_PATH) as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    print(f"per rerun, parse config + init_db  {per_rerun_seconds(every_run, runs) * 1000:8.3f} ms")
+    print(f"per rerun, cached                  {per_rerun_seconds(lambda: copy.deepcopy(config), runs) * 1000:8.3f} ms")
@@ -0,0 +1,39 @@
+# Compare time-to-first-token and total latency of the blocking and streaming GPT paths.
+# Run against the fake server (python -m benchmarks.fake_server, from the
+# repository root) to keep it offline and free:
+#   OPENAI_API_BASE=http://localhost:8000/v1 OPENAI_API_KEY=test python bench_streaming.py
+import sys
+import time
+import statistics
+from gpt_service import get_gpt_response, stream_gpt_response
+
+PROMPT = "Explain compound interest in three sentences."
+
+def bench_blocking(runs):
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        get_gpt_response(PROMPT)
+        elapsed = time.perf_counter() - start
+        # The first token only reaches the user once the whole reply is back.
+        results.append({"ttft": elapsed, "total": elapsed})
+    return results
+
+def bench_streaming(runs):
+    results = []
+    for _ in range(runs):
+        timings = {}
+        for _ in stream_gpt_response(PROMPT, timings=timings):
+            pass
+        results.append(timings)
+    return results
+
+def report(name, results):
+    ttft = statistics.median(r["ttft"] for r in results)
+    total = statistics.median(r["total"] for r in results)
+    print(f"{name:<10} ttft p50 {ttft * 1000:8.1f} ms   total p50 {total * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    report("blocking", bench_blocking(runs))
+    report("streaming", bench_streaming(runs))
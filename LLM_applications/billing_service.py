@@ -1,15 +1,104 @@
-import os, razorpay
-from db_service import create_order
+import os, sys, time, threading
+from pathlib import Path
+from contextlib import contextmanager
+from db_service import create_order, get_open_order, get_order_owner
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.telemetry import get_telemetry
 
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 PRO_PRICE_PAISE = int(os.getenv("PRO_PRICE_PAISE", "19900"))
 CURRENCY = os.getenv("CURRENCY", "INR")
+# Override to point at a local stub (python -m benchmarks.fake_server)
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL", "https://api.razorpay.com")
+# Unpaid orders younger than this are offered again instead of creating new ones
+ORDER_REUSE_HOURS = int(os.getenv("ORDER_REUSE_HOURS", "24"))
+
+_client = None
+_client_lock = threading.Lock()
 
-client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+def get_razorpay_client():
+    # Built on the first order, so importing this module doesn't load the SDK
+    global _client
+    with _client_lock:
+        if _client is None:
+            import razorpay
+            _client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET), base_url=RAZORPAY_BASE_URL)
+        return _client
 
 def create_razorpay_order(username):
-    order = client.order.create(dict(amount=PRO_PRICE_PAISE, currency=CURRENCY, payment_capture=1))
+    telemetry = get_telemetry()
+    with telemetry.span("razorpay_order_create"):
+        order = get_razorpay_client().order.create(dict(amount=PRO_PRICE_PAISE, currency=CURRENCY, payment_capture=1))
+    telemetry.count("razorpay_orders_created_total")
     # Persist for later verification
     create_order(username=username, order_id=order["id"], amount=PRO_PRICE_PAISE, currency=CURRENCY)
-    return order  # contains id, amount, currency, status
+    return order  # contains id, amount, currency, status, created_at
+
+def verify_payment(username, order_id, payment_id, signature):
+    # True only for a checkout response signed with our key secret, for an
+    # order that belongs to this user
+    if not (order_id and payment_id and signature and RAZORPAY_KEY_SECRET):
+        return False
+    if get_order_owner(order_id) != username:
+        return False
+    from razorpay.errors import SignatureVerificationError
+    try:
+        return get_razorpay_client().utility.verify_payment_signature({
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": signature,
+        })
+    except SignatureVerificationError:
+        return False
+
+# Checkout orders, reused per user. The open order is cached in-process, then
+# looked up in the orders table, and only created at Razorpay when neither has
+# one; a per-user lock keeps repeated clicks from creating duplicates. Cached
+# orders are offered until they are ORDER_REUSE_HOURS old, and expired ones
+# are dropped whenever a new order is cached.
+_open_orders = {}  # username -> (order, reusable until, unix time)
+_user_locks = {}  # username -> [lock, callers holding or waiting], dropped at zero
+_locks_lock = threading.Lock()
+
+@contextmanager
+def _user_lock(username):
+    with _locks_lock:
+        entry = _user_locks.setdefault(username, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _user_locks[username]
+
+def _cached_order(username, now):
+    entry = _open_orders.get(username)
+    return entry[0] if entry is not None and entry[1] > now else None
+
+def _prune_open_orders(now):
+    for username, entry in list(_open_orders.items()):
+        if entry[1] <= now and _open_orders.get(username) is entry:
+            _open_orders.pop(username, None)
+
+def get_checkout_order(username):
+    # Called on the checkout click, so only users who want to pay get an order
+    order = _cached_order(username, time.time())
+    if order is not None:
+        return order
+    with _user_lock(username):
+        now = time.time()
+        order = _cached_order(username, now)
+        if order is None:
+            order = get_open_order(username, PRO_PRICE_PAISE, CURRENCY, ORDER_REUSE_HOURS) or create_razorpay_order(username)
+            _prune_open_orders(now)
+            _open_orders[username] = (order, order.get("created_at", now) + ORDER_REUSE_HOURS * 3600)
+    return order
+
+def forget_checkout_order(username):
+    # Call once the order is paid; the next checkout gets a new one
+    _open_orders.pop(username, None)
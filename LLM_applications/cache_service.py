@@ -0,0 +1,265 @@
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from gpt_service import SYSTEM_PROMPT
+from shared.llm_client import get_client
+
+try:
+    import numpy as np
+except ImportError:  # semantic lookups fall back to pure Python
+    np = None
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+def _hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def _similarities(vector, embeddings):
+    # Cosine similarity of `vector` against each of `embeddings`
+    if np is None:
+        return [_cosine(vector, other) for other in embeddings]
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    query = np.asarray(vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return np.divide(matrix @ query, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0).tolist()
+
+def embed(text):
+    client = get_client()
+    return client.run(client.embeddings([text], model=EMBEDDING_MODEL))[0]
+
+
+# ----------------------------------------------------------
+# Storage backends
+# Entries are dicts: {"scope", "reply", "embedding", "created_at"}
+# ----------------------------------------------------------
+class MemoryBackend:
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def scope_entries(self, scope, limit):
+        # The `limit` most recently used entries with an embedding
+        found = []
+        with self._lock:
+            for k, e in reversed(self._data.items()):
+                if e["scope"] == scope and e["embedding"]:
+                    found.append((k, e))
+                    if len(found) >= limit:
+                        break
+        return found
+
+
+class SQLBackend:
+    # Stores entries in the `response_cache` table through the app's SQLAlchemy
+    # engine. The table is trimmed to `maxsize` every `trim_every` writes rather
+    # than counted on each one, so it can run up to `trim_every` rows over.
+    def __init__(self, maxsize=10000, trim_every=100):
+        from db_service import SessionLocal, CachedResponse
+        self.maxsize = maxsize
+        self.trim_every = trim_every
+        self._session = SessionLocal
+        self._model = CachedResponse
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _to_entry(self, row):
+        return {
+            "scope": row.scope,
+            "reply": row.reply,
+            "embedding": json.loads(row.embedding) if row.embedding else None,
+            "created_at": row.created_at.timestamp(),
+        }
+
+    def get(self, key):
+        db = self._session()
+        try:
+            row = db.get(self._model, key)
+            if row is None:
+                return None
+            row.last_used_at = datetime.utcnow()
+            db.commit()
+            return self._to_entry(row)
+        finally:
+            db.close()
+
+    def set(self, key, entry):
+        db = self._session()
+        try:
+            db.merge(self._model(
+                key=key,
+                scope=entry["scope"],
+                reply=entry["reply"],
+                embedding=json.dumps(entry["embedding"]) if entry["embedding"] else None,
+                created_at=datetime.fromtimestamp(entry["created_at"]),
+                last_used_at=datetime.utcnow(),
+            ))
+            with self._lock:
+                self._writes += 1
+                trim = self._writes % self.trim_every == 0
+            if trim:
+                db.flush()
+                excess = db.query(self._model).count() - self.maxsize
+                if excess > 0:
+                    oldest = db.query(self._model.key).order_by(self._model.last_used_at).limit(excess)
+                    db.query(self._model).filter(self._model.key.in_([k for (k,) in oldest])).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def delete(self, key):
+        db = self._session()
+        try:
+            db.query(self._model).filter(self._model.key == key).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def scope_entries(self, scope, limit):
+        # The `limit` most recently used entries with an embedding
+        db = self._session()
+        try:
+            rows = (db.query(self._model)
+                    .filter(self._model.scope == scope, self._model.embedding.isnot(None))
+                    .order_by(self._model.last_used_at.desc())
+                    .limit(limit)
+                    .all())
+            return [(row.key, self._to_entry(row)) for row in rows]
+        finally:
+            db.close()
+
+
+# ----------------------------------------------------------
+# Response cache
+# ----------------------------------------------------------
+class ResponseCache:
+    # Caches replies keyed on the normalized (system prompt, history, prompt,
+    # model, temperature). The history is the whole context sent to the model,
+    # rolling summary included, so a reply that depends on one conversation is
+    # only served to the same conversation; first turns (no history) are shared.
+    # With `semantic=True`, a miss falls back to the most similar cached prompt
+    # in the same scope if its cosine similarity is at least `threshold`,
+    # comparing against the `max_candidates` most recently used entries only.
+    def __init__(self, backend=None, ttl=3600, semantic=False, threshold=0.95, max_candidates=200):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.semantic = semantic
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "lookup_seconds": 0.0, "miss_seconds": 0.0, "misses_timed": 0}
+        # Prompt embeddings from semantic misses, reused by the put() that follows
+        self._miss_vectors = OrderedDict()
+
+    def _keys(self, prompt, history, model, temperature):
+        context = [{"role": m["role"], "content": _normalize(m["content"])} for m in history or []]
+        scope = _hash([_normalize(SYSTEM_PROMPT), context, model, round(float(temperature), 2)])
+        return scope, _hash([scope, _normalize(prompt)])
+
+    def _expired(self, entry):
+        return time.time() - entry["created_at"] > self.ttl
+
+    def _record(self, stat, started):
+        with self._lock:
+            self._stats[stat] += 1
+            self._stats["lookup_seconds"] += time.perf_counter() - started
+
+    def get(self, prompt, history=None, model="gpt-4o-mini", temperature=0.7):
+        started = time.perf_counter()
+        scope, key = self._keys(prompt, history, model, temperature)
+        entry = self.backend.get(key)
+        if entry is not None and self._expired(entry):
+            self.backend.delete(key)
+            entry = None
+        if entry is not None:
+            self._record("hits", started)
+            return entry["reply"]
+
+        if self.semantic:
+            vector = embed(_normalize(prompt))
+            with self._lock:
+                self._miss_vectors[key] = vector
+                while len(self._miss_vectors) > 256:  # misses whose reply was never put
+                    self._miss_vectors.popitem(last=False)
+            candidates = []
+            for other_key, other in self.backend.scope_entries(scope, self.max_candidates):
+                if self._expired(other):
+                    self.backend.delete(other_key)
+                else:
+                    candidates.append(other)
+            best, best_score = None, self.threshold
+            if candidates:
+                for other, score in zip(candidates, _similarities(vector, [c["embedding"] for c in candidates])):
+                    if score >= best_score:
+                        best, best_score = other, score
+            if best is not None:
+                self._record("semantic_hits", started)
+                return best["reply"]
+
+        self._record("misses", started)
+        return None
+
+    # `latency` is how long the upstream call took, for the miss latency stat.
+    def put(self, prompt, reply, history=None, model="gpt-4o-mini", temperature=0.7, latency=None):
+        scope, key = self._keys(prompt, history, model, temperature)
+        vector = None
+        if self.semantic:
+            with self._lock:
+                vector = self._miss_vectors.pop(key, None)
+            if vector is None:
+                vector = embed(_normalize(prompt))
+        self.backend.set(key, {
+            "scope": scope,
+            "reply": reply,
+            "embedding": vector,
+            "created_at": time.time(),
+        })
+        if latency is not None:
+            with self._lock:
+                self._stats["miss_seconds"] += latency
+                self._stats["misses_timed"] += 1
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        lookups = s["hits"] + s["semantic_hits"] + s["misses"]
+        return {
+            "hits": s["hits"],
+            "semantic_hits": s["semantic_hits"],
+            "misses": s["misses"],
+            "hit_rate": (s["hits"] + s["semantic_hits"]) / lookups if lookups else 0.0,
+            "avg_lookup_ms": 1000 * s["lookup_seconds"] / lookups if lookups else 0.0,
+            "avg_miss_ms": 1000 * s["miss_seconds"] / s["misses_timed"] if s["misses_timed"] else 0.0,
+        }
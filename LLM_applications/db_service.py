@@ -1,13 +1,43 @@
 import os
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
+from sqlalchemy import create_engine, insert, tuple_, Index, Column, Integer, String, Text, DateTime, Boolean, ForeignKey
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.telemetry import get_telemetry
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Queued messages that still can't be written after retrying are appended
+# here, and written on the next successful batch or writer start
+MESSAGE_SPILL_PATH = os.getenv("MESSAGE_SPILL_PATH", str(Path.home() / ".cache" / "genai-assistant" / "unsaved_messages.jsonl"))
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+telemetry = get_telemetry()
+
+def _pool_gauges():
+    pool = engine.pool
+    for stat in ("size", "checkedout", "overflow"):  # QueuePool only
+        if hasattr(pool, stat):
+            yield f"db_pool_{stat}", {}, getattr(pool, stat)()
+
+telemetry.register_collector(_pool_gauges)
+
+def _checkout(db):
+    # Take the pooled connection up front so pool wait is measured apart from the query
+    with telemetry.span("db_pool_checkout"):
+        db.connection()
 
 class User(Base):
     __tablename__ = "users"
@@ -19,8 +49,10 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # Covers the keyset pagination in get_history (and plain lookups by username)
+    __table_args__ = (Index("ix_messages_username_created_at_id", "username", "created_at", "id"),)
     id = Column(Integer, primary_key=True)
-    username = Column(String, index=True)
+    username = Column(String)
     role = Column(String)  # 'user' or 'assistant'
     content = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -32,12 +64,26 @@ class Order(Base):
     order_id = Column(String, unique=True)
     amount = Column(Integer)  # in paise
     currency = Column(String, default="INR")
-    status = Column(String, default="created")  # created, paid, failed
+    status = Column(String, default="created", index=True)  # created, paid, failed
     created_at = Column(DateTime, default=datetime.utcnow)
     paid_at = Column(DateTime, nullable=True)
 
+class CachedResponse(Base):
+    __tablename__ = "response_cache"
+    key = Column(String(64), primary_key=True)  # sha256 of the normalized request
+    scope = Column(String(64), index=True)  # sha256 of everything except the prompt
+    reply = Column(Text)
+    embedding = Column(Text, nullable=True)  # JSON list, for near-duplicate lookups
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so indexes added to a model
+    # later are created here; checkfirst makes this a no-op once they exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 def get_db():
     db = SessionLocal()
@@ -49,26 +95,373 @@ def get_db():
 def save_message(username, role, content):
     db = SessionLocal()
     try:
-        db.add(Message(username=username, role=role, content=content))
-        db.commit()
+        _checkout(db)
+        with telemetry.span("db_query", op="save_message"):
+            db.add(Message(username=username, role=role, content=content))
+            db.commit()
+    finally:
+        db.close()
+
+_FLUSH = object()
+_STOP = object()
+
+class MessageWriter:
+    # Write-behind queue for chat messages. A background thread collects queued
+    # messages and bulk-inserts them once `batch_size` rows are waiting or
+    # `flush_interval` seconds have passed, whichever comes first. A failed
+    # batch is retried with backoff `max_retries` times, then spilled to
+    # `spill_path` and written once the database accepts writes again; messages
+    # are never dropped.
+    def __init__(self, batch_size=100, flush_interval=1.0, max_retries=4, spill_path=MESSAGE_SPILL_PATH):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = Path(spill_path)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, username, role, content):
+        # Timestamp now so ordering reflects when the message happened, not when it was flushed
+        self._queue.put({"username": username, "role": role, "content": content, "created_at": datetime.utcnow()})
+
+    def flush(self):
+        # Blocks until everything queued so far is committed (or spilled to disk)
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        self._replay_spilled()  # left by an earlier process, or a crash mid-replay
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            control = item is _FLUSH or item is _STOP
+            if item is not None and not control:
+                batch.append(item)
+            if control or item is None or len(batch) >= self.batch_size:
+                if batch:
+                    try:
+                        self._write(batch)
+                    except Exception:
+                        # Only reached if spilling to disk failed too; keep the
+                        # thread alive for the messages queued after these
+                        logger.exception("Lost %d queued messages", len(batch))
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+            if control:
+                self._queue.task_done()
+            if item is _STOP:
+                return
+
+    def _insert(self, batch):
+        db = SessionLocal()
+        try:
+            _checkout(db)
+            with telemetry.span("db_query", op="write_messages"):
+                db.execute(insert(Message), batch)
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        telemetry.count("db_messages_written_total", len(batch))
+
+    def _write(self, batch):
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._insert(batch)
+                    break
+                except Exception:
+                    logger.exception("Failed to write %d queued messages (attempt %d)", len(batch), attempt + 1)
+                    if attempt < self.max_retries:
+                        time.sleep(min(30.0, 0.5 * 2 ** attempt))
+            else:
+                self._spill(batch)
+                return
+            self._replay_spilled()
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _spill(self, batch):
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps({**m, "created_at": m["created_at"].isoformat()}) + "\n" for m in batch)
+            f.flush()
+            os.fsync(f.fileno())
+        telemetry.count("db_messages_spilled_total", len(batch))
+        logger.error("Spilled %d messages to %s", len(batch), self.spill_path)
+
+    def _replay_spilled(self):
+        # Never raises: a claim that can't be replayed now stays on disk and is
+        # tried again after the next successful batch or on the next start
+        for claimed in self._claim_spilled():
+            try:
+                self._replay(claimed)
+            except Exception:
+                logger.exception("Failed to replay spilled messages from %s", claimed)
+
+    def _claim_spilled(self):
+        # Claim the spill file by renaming it, so two processes never replay it
+        # twice, and take over claims whose process is gone (a crash mid-replay)
+        # or that an earlier failed replay in this process left behind
+        prefix = self.spill_path.name + ".replaying"
+        claims = []
+        claim = self.spill_path.with_name(f"{prefix}.{os.getpid()}.{time.monotonic_ns()}")
+        try:
+            os.replace(self.spill_path, claim)
+            claims.append(claim)
+        except FileNotFoundError:
+            pass
+        for path in sorted(self.spill_path.parent.glob(prefix + "*")):
+            if path == claim:
+                continue
+            pid = path.name[len(prefix):].lstrip(".").split(".")[0]
+            if pid == str(os.getpid()):
+                claims.append(path)
+            elif not _process_alive(pid):
+                taken = self.spill_path.with_name(f"{prefix}.{os.getpid()}.{time.monotonic_ns()}")
+                try:
+                    os.replace(path, taken)
+                    claims.append(taken)
+                except FileNotFoundError:
+                    pass  # another process took it first
+        return claims
+
+    def _replay(self, claimed):
+        batch = []
+        with open(claimed, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    m = json.loads(line)
+                    m["created_at"] = datetime.fromisoformat(m["created_at"])
+                except (ValueError, KeyError, TypeError):
+                    # A torn line from a crash during _spill's append
+                    logger.error("Skipping unreadable line %d in %s: %r", number, claimed, line[:200])
+                    telemetry.count("db_messages_unreadable_total")
+                    continue
+                batch.append(m)
+        i = 0
+        try:
+            for i in range(0, len(batch), self.batch_size):
+                self._insert(batch[i:i + self.batch_size])
+        except Exception:
+            # Put back what wasn't written; the next successful batch tries again
+            logger.exception("Failed to replay spilled messages")
+            self._spill(batch[i:])
+        os.unlink(claimed)
+
+
+def _process_alive(pid):
+    # False for claims without a valid pid, such as ones from before claims had one
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_message_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter()
+            atexit.register(_writer.close)
+            telemetry.register_collector(lambda: [("db_message_queue_depth", {}, _writer._queue.qsize())])
+        return _writer
+
+def queue_message(username, role, content):
+    get_message_writer().enqueue(username, role, content)
+
+def get_history(username, before=None, limit=50):
+    # Returns (messages, cursor): up to `limit` messages older than `before`,
+    # oldest first, and the cursor for the next older page (None when exhausted).
+    # Pass `before=None` for the most recent page.
+    db = SessionLocal()
+    try:
+        _checkout(db)
+        q = db.query(Message.id, Message.role, Message.content, Message.created_at).filter(Message.username == username)
+        if before is not None:
+            q = q.filter(tuple_(Message.created_at, Message.id) < tuple_(*before))
+        with telemetry.span("db_query", op="get_history"):
+            rows = q.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit).all()
     finally:
         db.close()
+    messages = [{"id": r.id, "role": r.role, "content": r.content, "created_at": r.created_at} for r in reversed(rows)]
+    cursor = (rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return messages, cursor
 
 def create_order(username, order_id, amount, currency):
     db = SessionLocal()
     try:
-        db.add(Order(username=username, order_id=order_id, amount=amount, currency=currency, status="created"))
-        db.commit()
+        _checkout(db)
+        with telemetry.span("db_query", op="create_order"):
+            db.add(Order(username=username, order_id=order_id, amount=amount, currency=currency, status="created"))
+            db.commit()
     finally:
         db.close()
 
-def mark_order_paid(order_id):
+def get_open_order(username, amount, currency, max_age_hours=24):
+    # Newest unpaid order for this price, to reuse instead of creating another
     db = SessionLocal()
     try:
-        order = db.query(Order).filter(Order.order_id == order_id).first()
-        if order:
-            order.status = "paid"
-            order.paid_at = datetime.utcnow()
+        _checkout(db)
+        with telemetry.span("db_query", op="get_open_order"):
+            order = (db.query(Order.order_id, Order.amount, Order.currency, Order.created_at)
+                     .filter(Order.username == username, Order.status == "created",
+                             Order.amount == amount, Order.currency == currency,
+                             Order.created_at > datetime.utcnow() - timedelta(hours=max_age_hours))
+                     .order_by(Order.created_at.desc()).first())
+    finally:
+        db.close()
+    if order is None:
+        return None
+    created_at = order.created_at.replace(tzinfo=timezone.utc).timestamp()
+    return {"id": order.order_id, "amount": order.amount, "currency": order.currency, "created_at": created_at}
+
+def get_order_owner(order_id):
+    db = SessionLocal()
+    try:
+        _checkout(db)
+        with telemetry.span("db_query", op="get_order_owner"):
+            return db.query(Order.username).filter(Order.order_id == order_id).scalar()
+    finally:
+        db.close()
+
+def mark_orders_paid(order_ids):
+    # Marks a batch of orders paid in one transaction and upgrades their users.
+    # Only orders still awaiting payment change; paid, failed or unknown ones
+    # are skipped, so a repeated confirmation is a no-op. Returns
+    # {order_id: username} for the orders this call changed.
+    if not order_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        _checkout(db)
+        with telemetry.span("db_query", op="mark_orders_paid"):
+            rows = (db.query(Order.order_id, Order.username)
+                    .filter(Order.order_id.in_(set(order_ids)), Order.status == "created")
+                    .with_for_update().all())
+            paid = {r.order_id: r.username for r in rows}
+            if paid:
+                db.query(Order).filter(Order.order_id.in_(paid)).update(
+                    {Order.status: "paid", Order.paid_at: datetime.utcnow()}, synchronize_session=False)
+                db.query(User).filter(User.username.in_(set(paid.values()))).update(
+                    {User.plan: "pro"}, synchronize_session=False)
             db.commit()
+        telemetry.count("db_orders_paid_total", len(paid))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return paid
+
+def mark_order_paid(order_id):
+    return mark_orders_paid([order_id])
+
+class PaymentReconciler:
+    # Group commit for payment confirmations. confirm() queues an order id and
+    # returns a Future; a background thread marks everything queued within
+    # `max_wait` seconds (up to `batch_size`) paid in one transaction and
+    # resolves each future with the username it upgraded, or None when the
+    # order was no longer awaiting payment or is unknown.
+    def __init__(self, batch_size=200, max_wait=0.05):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="payment-reconciler", daemon=True)
+        self._thread.start()
+
+    def confirm(self, order_id):
+        future = Future()
+        self._queue.put((order_id, future))
+        return future
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, stop = [], item is _STOP
+            if not stop:
+                batch.append(item)
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+            if batch:
+                self._settle(batch)
+            if stop:
+                return
+
+    def _settle(self, batch):
+        try:
+            paid = mark_orders_paid([order_id for order_id, _ in batch])
+        except Exception as exc:
+            logger.exception("Failed to reconcile %d payments", len(batch))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for order_id, future in batch:
+            # A duplicate confirmation in the same batch resolves once with the username
+            future.set_result(paid.pop(order_id, None))
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+def get_payment_reconciler():
+    global _reconciler
+    with _reconciler_lock:
+        if _reconciler is None:
+            _reconciler = PaymentReconciler()
+            atexit.register(_reconciler.close)
+            telemetry.register_collector(lambda: [("db_payment_queue_depth", {}, _reconciler._queue.qsize())])
+        return _reconciler
+
+def confirm_payment(order_id):
+    # Future resolving to the upgraded username, or None if nothing changed
+    return get_payment_reconciler().confirm(order_id)
+
+def get_user_plan(username):
+    # The users row if there is one (accounts live in auth_config.yaml, so
+    # there often isn't), otherwise "pro" once any of the user's orders is paid
+    db = SessionLocal()
+    try:
+        _checkout(db)
+        with telemetry.span("db_query", op="get_user_plan"):
+            plan = db.query(User.plan).filter(User.username == username).scalar()
+            if plan is None:
+                paid = db.query(Order.id).filter(Order.username == username, Order.status == "paid").first()
+                plan = "pro" if paid else "free"
     finally:
         db.close()
+    return plan
@@ -1,21 +1,142 @@
-import os
-import openai
+import sys
+import time
+from pathlib import Path
+from contextlib import nullcontext
 from dotenv import load_dotenv
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root, for the shared package
+from shared.llm_client import get_client
+from shared.prompt_registry import get_prompt
+from shared.telemetry import get_telemetry
+from scheduler import get_scheduler
 
-SYSTEM_PROMPT = "You are a helpful AI assistant. Keep answers concise and clear."
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")  # gpt-4o family
+except Exception:  # not installed, or the encoding can't be downloaded (offline)
+    _ENCODING = None
 
-def get_gpt_response(prompt, history=None, model="gpt-4o-mini", temperature=0.7):
-    if history is None:
-        history = []
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    messages.extend(history)
+SYSTEM_TEMPLATE = get_prompt("assistant_system")
+SUMMARY_TEMPLATE = get_prompt("assistant_summary")
+SYSTEM_PROMPT = SYSTEM_TEMPLATE.text
+
+def _build_messages(prompt, history):
+    messages = [{"role": "system", "content": SYSTEM_TEMPLATE.render()}]
+    messages.extend(history or [])
     messages.append({"role": "user", "content": prompt})
-    resp = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=temperature
-    )
-    return resp["choices"][0]["message"]["content"]
+    return messages
+
+def _admission(username):
+    # Requests made for a user wait for a slot by plan (and may raise QuotaExceeded)
+    return get_scheduler().slot(username) if username else nullcontext()
+
+def get_gpt_response(prompt, history=None, model="gpt-4o-mini", temperature=0.7, username=None):
+    client = get_client()
+    with _admission(username), get_telemetry().span("gpt_request", mode="blocking", model=model):
+        return client.run(client.chat(_build_messages(prompt, history), model=model, temperature=temperature,
+                                      template=SYSTEM_TEMPLATE))
+
+# Yields reply tokens as they arrive. Pass a dict as `timings` to get
+# `ttft` (seconds to first token) and `total` (seconds to last token), both
+# including any wait for a scheduler slot.
+def stream_gpt_response(prompt, history=None, model="gpt-4o-mini", temperature=0.7, timings=None, username=None):
+    client, telemetry = get_client(), get_telemetry()
+    start = time.perf_counter()
+    ttft = None
+    with _admission(username):
+        tokens = client.chat_stream(_build_messages(prompt, history), model=model, temperature=temperature,
+                                    template=SYSTEM_TEMPLATE)
+        with telemetry.span("gpt_request", mode="stream", model=model):
+            for token in client.iter_sync(tokens):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    telemetry.observe("gpt_ttft_seconds", ttft, model=model)
+                    if timings is not None:
+                        timings["ttft"] = ttft
+                yield token
+    if timings is not None:
+        timings["total"] = time.perf_counter() - start
+
+def count_tokens(text):
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, len(text) // 4)  # rough estimate when tiktoken is not installed
+
+def _message_tokens(message):
+    return count_tokens(message["content"]) + 4  # role and separators
+
+class ConversationWindow:
+    # Keeps the most recent turns that fit in `max_tokens` (the summary message
+    # included) and folds everything older into a rolling summary. The summary
+    # is cached and only refreshed once at least `min_fold` messages have left
+    # the window; until then those few messages are left out rather than
+    # summarized on every turn. With a username, summary calls go through the
+    # scheduler like any other request and can raise QuotaExceeded.
+    def __init__(self, max_tokens=2000, model="gpt-4o-mini", min_fold=6):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.min_fold = min_fold
+        self.summary = ""
+        self.summarized = 0  # number of history messages folded into the summary
+        self._folded = []  # (role, content) of those messages, to notice a replaced history
+        self.tokens_saved = 0  # for the last request
+        self.total_tokens_saved = 0
+
+    def build(self, history, username=None):
+        if len(history) < self.summarized or [(m["role"], m["content"]) for m in history[:self.summarized]] != self._folded:
+            # History was cleared or replaced; start over
+            self.summary = ""
+            self.summarized = 0
+            self._folded = []
+
+        start = self._window_start(history, self.max_tokens - self._summary_tokens())
+        if start - self.summarized >= self.min_fold:
+            # Fold down to half the budget so the next few turns fit without
+            # another refresh
+            fold = self._window_start(history, self.max_tokens // 2)
+            self.summary = self._summarize(history[self.summarized:fold], username)
+            self.summarized = fold
+            self._folded = [(m["role"], m["content"]) for m in history[:fold]]
+            start = self._window_start(history, self.max_tokens - self._summary_tokens())
+
+        window = list(history[start:])
+        if self.summary:
+            window.insert(0, self._summary_message())
+
+        full = sum(_message_tokens(m) for m in history)
+        self.tokens_saved = max(0, full - sum(_message_tokens(m) for m in window))
+        self.total_tokens_saved += self.tokens_saved
+        return window
+
+    def _summary_message(self):
+        return {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}
+
+    def _summary_tokens(self):
+        return _message_tokens(self._summary_message()) if self.summary else 0
+
+    def _window_start(self, history, budget):
+        start, used = len(history), 0
+        while start > self.summarized:
+            tokens = _message_tokens(history[start - 1])
+            if used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def _summarize(self, messages, username=None):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if self.summary:
+            transcript = f"Earlier summary: {self.summary}\n{transcript}"
+        client = get_client()
+        with _admission(username), get_telemetry().span("gpt_summarize", model=self.model):
+            return client.run(client.chat(
+                [
+                    {"role": "system", "content": SUMMARY_TEMPLATE.render()},
+                    {"role": "user", "content": transcript},
+                ],
+                model=self.model,
+                temperature=0,
+                template=SUMMARY_TEMPLATE
+            ))
@@ -0,0 +1,171 @@
+# Admission control in front of the assistant's LLM calls, by plan.
+# - each user has a token bucket sized by their plan; a request spends one
+#   token, and an empty bucket raises QuotaExceeded with the wait until the next
+# - at most `max_concurrency` requests are in flight. When every slot is busy,
+#   requests queue per plan and each freed slot goes to the next plan in a
+#   smooth weighted round robin, so Pro requests overtake free ones without
+#   starving them
+# - plans are looked up once per user and cached for `plan_ttl` seconds
+# - idle buckets and expired plans are swept every `PRUNE_INTERVAL` seconds;
+#   a bucket idle long enough to refill is the same as a new one, so only
+#   users active in the last refill period are kept in memory
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from shared.telemetry import get_telemetry
+
+MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", os.getenv("LLM_MAX_CONCURRENCY", "16")))
+PLAN_TTL = int(os.getenv("PLAN_CACHE_TTL", "300"))
+# requests per minute, bucket size (burst) and share of contended slots
+PLANS = {
+    "free": {"per_minute": int(os.getenv("FREE_REQUESTS_PER_MINUTE", "10")), "burst": 5, "weight": 1},
+    "pro": {"per_minute": int(os.getenv("PRO_REQUESTS_PER_MINUTE", "60")), "burst": 20, "weight": 8},
+}
+DEFAULT_PLAN = "free"
+PRUNE_INTERVAL = 60
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, plan, retry_after):
+        super().__init__(f"The {plan} plan's request limit was reached; try again in {retry_after:.0f}s.")
+        self.plan = plan
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def idle(self, now):
+        # True once the bucket would have refilled to capacity
+        return self.rate > 0 and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    def take(self):
+        # Returns 0 if a token was spent, else seconds until one is available
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else float("inf")
+
+
+def _lookup_plan(username):
+    from db_service import get_user_plan
+    return get_user_plan(username)
+
+
+class PriorityScheduler:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, plans=PLANS, plan_lookup=_lookup_plan, plan_ttl=PLAN_TTL):
+        self.plans = plans
+        self.plan_lookup = plan_lookup
+        self.plan_ttl = plan_ttl
+        self._lock = threading.Lock()
+        self._free_slots = max_concurrency
+        self._waiting = {plan: deque() for plan in plans}  # threading.Event per queued request
+        self._credit = {plan: 0 for plan in plans}
+        self._buckets = {}  # (username, plan) -> TokenBucket
+        self._user_plans = {}  # username -> (plan, expires at)
+        self._next_prune = time.monotonic() + PRUNE_INTERVAL
+        self.telemetry = get_telemetry()
+        self.telemetry.register_collector(self._gauges)
+
+    def plan_for(self, username):
+        now = time.monotonic()
+        cached = self._user_plans.get(username)
+        if cached and cached[1] > now:
+            return cached[0]
+        plan = self.plan_lookup(username)
+        plan = plan if plan in self.plans else DEFAULT_PLAN
+        self._user_plans[username] = (plan, now + self.plan_ttl)
+        return plan
+
+    def invalidate(self, username):
+        # Call after a user's plan changes
+        self._user_plans.pop(username, None)
+
+    def acquire(self, username):
+        # Blocks until a slot is free; returns the user's plan
+        plan = self.plan_for(username)
+        with self._lock:
+            self._maybe_prune()
+            bucket = self._buckets.get((username, plan))
+            if bucket is None:
+                bucket = self._buckets[(username, plan)] = TokenBucket(self.plans[plan]["per_minute"], self.plans[plan]["burst"])
+            retry_after = bucket.take()
+            if retry_after:
+                self.telemetry.count("scheduler_requests_total", plan=plan, outcome="throttled")
+                raise QuotaExceeded(plan, retry_after)
+            self.telemetry.count("scheduler_requests_total", plan=plan, outcome="admitted")
+            if self._free_slots > 0:
+                self._free_slots -= 1
+                self.telemetry.observe("scheduler_wait_seconds", 0.0, plan=plan)
+                return plan
+            turn = threading.Event()
+            self._waiting[plan].append(turn)
+        start = time.perf_counter()
+        turn.wait()  # release() hands its slot straight to us
+        self.telemetry.observe("scheduler_wait_seconds", time.perf_counter() - start, plan=plan)
+        return plan
+
+    def release(self):
+        with self._lock:
+            plan = self._next_plan()
+            if plan is None:
+                self._free_slots += 1
+            else:
+                self._waiting[plan].popleft().set()
+
+    def _maybe_prune(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        for key in [key for key, bucket in self._buckets.items() if bucket.idle(now)]:
+            del self._buckets[key]
+        for username, (_, expires) in list(self._user_plans.items()):
+            if expires <= now:
+                self._user_plans.pop(username, None)
+
+    def _next_plan(self):
+        # Smooth weighted round robin over the plans with queued requests
+        queued = [plan for plan, waiting in self._waiting.items() if waiting]
+        if not queued:
+            return None
+        for plan in queued:
+            self._credit[plan] += self.plans[plan]["weight"]
+        chosen = max(queued, key=self._credit.get)
+        self._credit[chosen] -= sum(self.plans[plan]["weight"] for plan in queued)
+        return chosen
+
+    @contextmanager
+    def slot(self, username):
+        plan = self.acquire(username)
+        try:
+            yield plan
+        finally:
+            self.release()
+
+    def _gauges(self):
+        with self._lock:
+            return [("scheduler_free_slots", {}, self._free_slots)] + [
+                ("scheduler_queue_depth", {"plan": plan}, len(waiting)) for plan, waiting in self._waiting.items()]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PriorityScheduler()
+        return _scheduler
@@ -0,0 +1 @@
+# AskMyBank: RAG over the bank FAQ CSV, importable from the notebook or an app.
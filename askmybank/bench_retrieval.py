@@ -0,0 +1,112 @@
+# Query latency and recall@5 of the local NumPy retriever versus Chroma, on the
+# FAQ set scaled up synthetically. Both use the same hashed TF-IDF embeddings so
+# the comparison is of the search path, and the run needs no API key.
+#   python -m askmybank.bench_retrieval --rows 100000 --queries 500
+import time
+import random
+import argparse
+import statistics
+import itertools
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from askmybank.index import DEFAULT_CSV, load_faqs
+from askmybank.local_retriever import HashedTfidfEmbeddings, LocalVectorIndex
+
+CITIES = ["Mumbai", "Pune", "Delhi", "Chennai", "Kolkata", "Jaipur", "Surat", "Indore", "Nagpur", "Bhopal",
+          "Lucknow", "Kanpur", "Patna", "Ranchi", "Raipur", "Goa", "Kochi", "Mysore", "Hubli", "Nashik",
+          "Agra", "Varanasi", "Amritsar", "Ludhiana", "Shimla", "Dehradun", "Guwahati", "Shillong", "Imphal", "Agartala",
+          "Vizag", "Vijayawada", "Warangal", "Madurai", "Coimbatore", "Salem", "Trichy", "Mangalore", "Udupi", "Belgaum"]
+PRODUCTS = ["gold", "platinum", "silver", "classic", "premier", "student", "senior", "salary", "family", "business",
+            "rural", "urban", "digital", "priority", "youth", "women", "pension", "farmer", "startup", "export",
+            "heritage", "metro", "coastal", "royal", "elite"]
+SEGMENTS = ["retail", "corporate", "nri", "sme", "wealth"]
+
+
+def synthetic_corpus(df, rows):
+    # One row per (FAQ, city, product, segment) combination, so every row is unique
+    combos = itertools.product(range(len(df)), CITIES, PRODUCTS, SEGMENTS)
+    docs = []
+    for i, (faq, city, product, segment) in enumerate(itertools.islice(combos, rows)):
+        q, a = df["question"][faq], df["answer"][faq]
+        docs.append(Document(
+            page_content=f"Q: {q} ({product} {segment} account, {city} branch) A: {a}",
+            metadata={"row": i, "faq": faq, "city": city, "product": product, "segment": segment},
+        ))
+    return docs
+
+def synthetic_queries(docs, df, count, seed=0):
+    # Reworded questions that mention the same branch, product and segment
+    rng = random.Random(seed)
+    queries = []
+    for doc in rng.sample(docs, min(count, len(docs))):
+        city, product, segment = doc.metadata["city"], doc.metadata["product"], doc.metadata["segment"]
+        words = df["question"][doc.metadata["faq"]].rstrip("?").split()
+        words.pop(rng.randrange(len(words)))  # drop a word
+        queries.append((f"{' '.join(words)} for a {segment} {product} account in {city}?", doc.metadata["row"]))
+    return queries
+
+def recall_at_5(results, queries):
+    return sum(truth in ids for ids, (_, truth) in zip(results, queries)) / len(queries)
+
+def bench_local(docs, queries):
+    start = time.perf_counter()
+    index = LocalVectorIndex(docs, HashedTfidfEmbeddings())
+    build = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query, _ in queries:
+        start = time.perf_counter()
+        hits = index.search([query], k=5)[0]
+        latencies.append(time.perf_counter() - start)
+        results.append([d.metadata["row"] for d, _ in hits])
+
+    start = time.perf_counter()
+    index.search([q for q, _ in queries], k=5)
+    batched = (time.perf_counter() - start) / len(queries)
+    return build, latencies, batched, recall_at_5(results, queries)
+
+def bench_chroma(docs, queries):
+    from langchain_chroma import Chroma
+    embeddings = HashedTfidfEmbeddings()
+    embeddings.fit([d.page_content for d in docs])  # same IDF weights as the local index
+
+    start = time.perf_counter()
+    store = Chroma(collection_name="bench", embedding_function=embeddings, collection_metadata={"hnsw:space": "cosine"})
+    for i in range(0, len(docs), 5000):
+        store.add_documents(docs[i:i + 5000])
+    build = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query, _ in queries:
+        start = time.perf_counter()
+        hits = store.similarity_search(query, k=5)
+        latencies.append(time.perf_counter() - start)
+        results.append([d.metadata["row"] for d in hits])
+    store.delete_collection()
+    return build, latencies, None, recall_at_5(results, queries)
+
+def report(name, build, latencies, batched, recall):
+    latencies = sorted(latencies)
+    line = (f"{name:<8} build {build:7.1f}s   p50 {statistics.median(latencies) * 1000:7.2f} ms"
+            f"   p95 {latencies[int(0.95 * len(latencies))] * 1000:7.2f} ms   recall@5 {recall:.3f}")
+    if batched is not None:
+        line += f"   batched {batched * 1000:.2f} ms/query"
+    print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    df = load_faqs(args.csv)
+    docs = synthetic_corpus(df, args.rows)
+    queries = synthetic_queries(docs, df, args.queries)
+    print(f"{len(docs)} documents, {len(queries)} queries")
+    report("local", *bench_local(docs, queries))
+    if not args.skip_chroma:
+        report("chroma", *bench_chroma(docs, queries))
@@ -0,0 +1,68 @@
+# Tiered answering in front of the RAG chain.
+#
+#   1. faq_exact  - the normalized question is a question in the FAQ CSV
+#   2. faq_fuzzy  - a FAQ question is a near-identical textual match (typos,
+#                   punctuation); the cutoff is high because "open" vs "close"
+#                   a savings account already scores ~0.92
+#   3. cache      - the same normalized question was answered by RAG before
+#   4. rag        - the full retrieval + LLM chain
+#
+# The first three need no embedding call, vector search or completion. Each
+# answer is counted and timed per tier through shared.telemetry
+# (askmybank_answers_total, askmybank_answer_seconds).
+import re
+import time
+import difflib
+import threading
+from collections import OrderedDict, Counter
+
+from shared.telemetry import get_telemetry
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(question):
+    return " ".join(_PUNCTUATION.sub(" ", question.lower()).split())
+
+
+class TieredAnswerer:
+    def __init__(self, chain, df, fuzzy_cutoff=0.95, cache_size=1024):
+        self.chain = chain
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.cache_size = cache_size
+        self.faqs = {normalize(q): a for q, a in zip(df["question"], df["answer"])}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.tiers = Counter()
+
+    def _lookup(self, key):
+        if key in self.faqs:
+            return "faq_exact", self.faqs[key]
+        match = difflib.get_close_matches(key, self.faqs, n=1, cutoff=self.fuzzy_cutoff)
+        if match:
+            return "faq_fuzzy", self.faqs[match[0]]
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return "cache", self._cache[key]
+        return None, None
+
+    def answer(self, question):
+        # Returns {"answer", "tier", "seconds"}
+        start = time.perf_counter()
+        key = normalize(question)
+        tier, answer = self._lookup(key)
+        if tier is None:
+            tier = "rag"
+            answer = self.chain.invoke({"input": question}).get("answer", "").strip()
+            if answer:
+                with self._lock:
+                    self._cache[key] = answer
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        self.tiers[tier] += 1
+        seconds = time.perf_counter() - start
+        telemetry = get_telemetry()
+        telemetry.count("askmybank_answers_total", tier=tier)
+        telemetry.observe("askmybank_answer_seconds", seconds, tier=tier)
+        return {"answer": answer, "tier": tier, "seconds": seconds}
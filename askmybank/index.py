@@ -0,0 +1,95 @@
+# Persistent Chroma index over bank_faqs.csv, updated incrementally.
+#
+# Every FAQ row is identified by a hash of its question and answer. On open,
+# the CSV is diffed against the rows already in the index: only added or
+# changed rows are embedded, and rows no longer in the CSV are deleted. If the
+# CSV file itself is unchanged since the last sync, the diff is skipped and
+# the index is just loaded from disk.
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+DEFAULT_CSV = Path(__file__).resolve().parents[1] / "bank_faqs.csv"
+DEFAULT_PERSIST_DIR = Path(__file__).resolve().parents[1] / ".askmybank_index"
+COLLECTION = "bank_faqs"
+MANIFEST = "manifest.json"
+
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+
+def load_faqs(csv_path=DEFAULT_CSV):
+    return pd.read_csv(csv_path)
+
+def row_hash(question, answer):
+    return hashlib.sha256(f"{question}\x1f{answer}".encode("utf-8")).hexdigest()
+
+def _file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+def faq_documents(df):
+    # {row hash: [chunk Documents]} for every FAQ row
+    docs = {}
+    for question, answer in zip(df["question"], df["answer"]):
+        h = row_hash(question, answer)
+        doc = Document(
+            page_content=f"Q: {question} A: {answer}",
+            metadata={"row_hash": h, "question": question, "answer": answer},
+        )
+        docs[h] = text_splitter.split_documents([doc])
+    return docs
+
+
+def sync_index(vectorstore, df):
+    # Brings the index in line with `df`. Returns {"added", "removed", "unchanged"} row counts.
+    current = faq_documents(df)
+    stored = vectorstore.get(include=["metadatas"])
+    indexed = {}
+    for chunk_id, meta in zip(stored["ids"], stored["metadatas"]):
+        indexed.setdefault(meta["row_hash"], []).append(chunk_id)
+
+    removed = [chunk_id for h, ids in indexed.items() if h not in current for chunk_id in ids]
+    if removed:
+        vectorstore.delete(ids=removed)
+
+    added = {h: chunks for h, chunks in current.items() if h not in indexed}
+    if added:
+        documents, ids = [], []
+        for h, chunks in added.items():
+            for i, chunk in enumerate(chunks):
+                documents.append(chunk)
+                ids.append(f"{h}-{i}")
+        vectorstore.add_documents(documents, ids=ids)
+
+    return {
+        "added": len(added),
+        "removed": len({h for h in indexed if h not in current}),
+        "unchanged": len(current) - len(added),
+    }
+
+
+def open_index(csv_path=DEFAULT_CSV, persist_directory=DEFAULT_PERSIST_DIR, embeddings=None):
+    # Returns (vectorstore, stats). `stats` is None when the CSV was unchanged
+    # and no diff was needed.
+    from langchain_chroma import Chroma
+    from langchain_openai import OpenAIEmbeddings
+
+    persist_directory = Path(persist_directory)
+    vectorstore = Chroma(
+        collection_name=COLLECTION,
+        embedding_function=embeddings or OpenAIEmbeddings(),
+        persist_directory=str(persist_directory),
+    )
+
+    manifest_path = persist_directory / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    csv_hash = _file_hash(csv_path)
+    if manifest.get("csv_hash") == csv_hash:
+        return vectorstore, None
+
+    stats = sync_index(vectorstore, load_faqs(csv_path))
+    manifest_path.write_text(json.dumps({"csv_hash": csv_hash}))
+    return vectorstore, stats
@@ -0,0 +1,119 @@
+# Offline retrieval for AskMyBank: no embedding API and no vector database.
+#
+# Documents are embedded into one contiguous float32 matrix and queries are
+# answered with a single matrix multiply plus argpartition top-k, batched when
+# several queries come at once. The matrix is stored feature-major
+# (dims x documents), so a sparse query only multiplies the rows of the
+# features it actually contains. The default embedder is a hashed TF-IDF over
+# word unigrams and bigrams; any LangChain `Embeddings` (e.g. a local
+# HuggingFace model) can be passed instead.
+import re
+import zlib
+from typing import Any, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from askmybank.index import faq_documents
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _features(text):
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashedTfidfEmbeddings(Embeddings):
+    # Feature hashing keeps the vocabulary fixed-size; crc32 keeps it stable across runs.
+    def __init__(self, dims=1024):
+        self.dims = dims
+        self.idf = np.ones(dims, dtype=np.float32)
+
+    def _counts(self, texts):
+        counts = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [zlib.crc32(f.encode("utf-8")) % self.dims for f in _features(text)]
+            np.add.at(counts[row], buckets, 1.0)
+        return counts
+
+    def fit(self, texts):
+        counts = self._counts(texts)
+        doc_freq = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1).astype(np.float32)
+        return counts
+
+    def transform(self, texts, counts=None):
+        counts = self._counts(texts) if counts is None else counts
+        nonzero = counts > 0
+        counts[nonzero] = 1 + np.log(counts[nonzero])  # sublinear tf
+        counts *= self.idf
+        return counts
+
+    def embed_documents(self, texts):
+        return self.transform(texts).tolist()
+
+    def embed_query(self, text):
+        return self.transform([text])[0].tolist()
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    def __init__(self, documents, embeddings=None, batch_size=256):
+        self.documents = documents
+        self.embeddings = embeddings or HashedTfidfEmbeddings()
+        self.batch_size = batch_size
+        texts = [d.page_content for d in documents]
+        if isinstance(self.embeddings, HashedTfidfEmbeddings):
+            vectors = self.embeddings.transform(texts, self.embeddings.fit(texts))
+        else:
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        self.matrix = np.ascontiguousarray(_normalize_rows(vectors).T, dtype=np.float32)
+
+    def _embed_queries(self, queries):
+        if isinstance(self.embeddings, HashedTfidfEmbeddings):
+            vectors = self.embeddings.transform(queries)
+        else:
+            vectors = np.asarray([self.embeddings.embed_query(q) for q in queries], dtype=np.float32)
+        return _normalize_rows(vectors)
+
+    def search(self, queries, k=5):
+        # Returns, per query, a list of (Document, cosine score), best first
+        k = min(k, len(self.documents))
+        results = []
+        for start in range(0, len(queries), self.batch_size):
+            vectors = self._embed_queries(queries[start:start + self.batch_size])
+            features = np.flatnonzero(vectors.any(axis=0))
+            if len(features) < len(self.matrix) // 2:
+                scores = vectors[:, features] @ self.matrix[features]
+            else:
+                scores = vectors @ self.matrix
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, candidates in zip(scores, top):
+                ranked = candidates[np.argsort(-row[candidates])]
+                results.append([(self.documents[i], float(row[i])) for i in ranked])
+        return results
+
+
+class LocalRetriever(BaseRetriever):
+    # Drop-in replacement for `vectorstore.as_retriever(...)` in create_retrieval_chain
+    index: Any
+    k: int = 5
+
+    @classmethod
+    def from_dataframe(cls, df, k=5, embeddings=None):
+        documents = [chunk for chunks in faq_documents(df).values() for chunk in chunks]
+        return cls(index=LocalVectorIndex(documents, embeddings), k=k)
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return [doc for doc, _ in self.index.search([query], self.k)[0]]
+
+    def batch_search(self, queries):
+        return [[doc for doc, _ in hits] for hits in self.index.search(queries, self.k)]
@@ -0,0 +1 @@
+# Offline benchmark and load-test harness; see the "Benchmarks" section of the README.
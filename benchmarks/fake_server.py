@@ -0,0 +1,265 @@
+# Local stand-in for the OpenAI and Razorpay HTTP APIs, for offline benchmarks
+# and load tests. Responses are canned but shaped like the real ones, and every
+# endpoint sleeps for a configurable latency (± jitter) so client-side
+# concurrency, pooling and streaming behave as they would against the real API.
+#
+# OpenAI:   /v1/chat/completions (streaming, vision), /v1/completions,
+#           /v1/embeddings, /v1/images/generations, /v1/audio/speech
+# Razorpay: POST /v1/orders, GET /v1/orders/<id>
+#
+# Chat usage reports cached prompt tokens the way the provider does: once a
+# system prompt of 1024+ tokens has been seen, later requests starting with it
+# get it back as cached_tokens.
+#
+#   python -m benchmarks.fake_server --port 8000 --latency 0.3
+#   OPENAI_BASE_URL=http://localhost:8000/v1 RAZORPAY_BASE_URL=http://localhost:8000 streamlit run ...
+import json
+import time
+import uuid
+import base64
+import random
+import struct
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Seconds before the first byte of each response, before jitter
+DEFAULT_LATENCY = {
+    "chat": 0.3,
+    "vision": 0.8,
+    "completions": 0.3,
+    "embeddings": 0.05,
+    "images": 2.0,
+    "image_preview": 0.5,  # quality="low" or 256x256 drafts
+    "speech": 0.5,
+    "razorpay": 0.15,
+}
+# 1x1 PNG, decodable by PIL and st.image
+PNG_1PX = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+REPLY = ("Compound interest means you earn interest on your interest as well as on the "
+         "money you put in, so savings grow faster the longer they stay invested.")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 drops SYNs under a burst of new connections
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+def _text(content):
+    # Message content is a string, or a list of parts for vision requests
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+def _has_image(messages):
+    return any(isinstance(m.get("content"), list) and
+               any(p.get("type") == "image_url" for p in m["content"]) for m in messages)
+
+
+class FakeServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=None, scale=1.0, jitter=0.2,
+                 token_delay=0.01, reply=REPLY, embedding_dims=1536):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.scale = scale
+        self.jitter = jitter
+        self.token_delay = token_delay * scale
+        self.reply = reply
+        self.embedding_dims = embedding_dims
+        self.requests = {}
+        self.orders = {}
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _wait(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        base = self.latency[endpoint] * self.scale
+        time.sleep(max(0.0, random.uniform(base * (1 - self.jitter), base * (1 + self.jitter))))
+
+    def _usage(self, messages, completion):
+        prompt_tokens = sum(_tokens(_text(m.get("content", ""))) + 4 for m in messages)
+        cached = 0
+        if messages and messages[0].get("role") == "system":
+            system = _text(messages[0]["content"])
+            key = hashlib.sha256(system.encode()).hexdigest()
+            with self._lock:
+                seen = key in self._seen_prefixes
+                self._seen_prefixes.add(key)
+            if seen and _tokens(system) >= 1024:
+                cached = _tokens(system) // 128 * 128  # cached in 128-token blocks
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _tokens(completion),
+            "total_tokens": prompt_tokens + _tokens(completion),
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _embedding(self, text, encoding_format=None):
+        rng = random.Random(hashlib.sha256(text.encode()).digest())
+        vector = [rng.uniform(-1, 1) for _ in range(self.embedding_dims)]
+        if encoding_format == "base64":  # what the openai SDK asks for by default
+            return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+        return vector
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients can pool connections
+            disable_nagle_algorithm = True  # stream small chunks without delayed-ACK stalls
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    return json.loads(raw or b"{}")
+                except ValueError:
+                    return {}
+
+            def _send(self, status, body, content_type="application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.startswith("/v1/orders/"):
+                    server._wait("razorpay")
+                    order = server.orders.get(self.path.rsplit("/", 1)[1])
+                    if order is None:
+                        return self._send(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "not found"}})
+                    return self._send(200, order)
+                self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            def do_POST(self):
+                body = self._body()
+                path = self.path.split("?")[0]
+                if path.endswith("/chat/completions"):
+                    return self._chat(body)
+                if path.endswith("/completions"):
+                    server._wait("completions")
+                    return self._send(200, {
+                        "id": f"cmpl-{uuid.uuid4().hex}", "object": "text_completion", "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "text": server.reply, "logprobs": None, "finish_reason": "stop"}],
+                        "usage": server._usage([{"content": str(body.get("prompt", ""))}], server.reply),
+                    })
+                if path.endswith("/embeddings"):
+                    server._wait("embeddings")
+                    inputs = body.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    return self._send(200, {
+                        "object": "list", "model": body.get("model", "fake"),
+                        "data": [{"object": "embedding", "index": i, "embedding": server._embedding(str(text), body.get("encoding_format"))}
+                                 for i, text in enumerate(inputs)],
+                        "usage": {"prompt_tokens": sum(_tokens(str(t)) for t in inputs),
+                                  "total_tokens": sum(_tokens(str(t)) for t in inputs)},
+                    })
+                if path.endswith("/images/generations"):
+                    cheap = body.get("quality") == "low" or body.get("size") == "256x256"
+                    server._wait("image_preview" if cheap else "images")
+                    b64 = base64.b64encode(PNG_1PX).decode()
+                    return self._send(200, {"created": int(time.time()),
+                                            "data": [{"b64_json": b64} for _ in range(int(body.get("n", 1)))]})
+                if path.endswith("/audio/speech"):
+                    server._wait("speech")
+                    # ~1 KB of "audio" per 16 characters, roughly a 64 kbps MP3
+                    return self._send(200, b"ID3" + b"\0" * (len(body.get("input", "")) * 64), "audio/mpeg")
+                if path.endswith("/v1/orders"):
+                    server._wait("razorpay")
+                    order = {
+                        "id": f"order_{uuid.uuid4().hex[:14]}", "entity": "order",
+                        "amount": body.get("amount"), "amount_paid": 0, "amount_due": body.get("amount"),
+                        "currency": body.get("currency", "INR"), "receipt": body.get("receipt"),
+                        "status": "created", "attempts": 0, "notes": body.get("notes", []),
+                        "created_at": int(time.time()),
+                    }
+                    with server._lock:
+                        server.orders[order["id"]] = order
+                    return self._send(200, order)
+                self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            def _chat(self, body):
+                messages = body.get("messages", [])
+                server._wait("vision" if _has_image(messages) else "chat")
+                usage = server._usage(messages, server.reply)
+                base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model", "fake")}
+                if not body.get("stream"):
+                    return self._send(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": server.reply}, "finish_reason": "stop"}
+                    ]})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = server.reply.split(" ")
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.token_delay)
+                    chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                        {"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}
+                    ]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                self._chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI + Razorpay API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=1.0, help="multiplier for the default per-endpoint latencies")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    args = parser.parse_args()
+    server = FakeServer(args.host, args.port, scale=args.latency, token_delay=args.token_delay)
+    print(f"Fake OpenAI/Razorpay API on {server.url} (OPENAI_BASE_URL={server.url}/v1, RAZORPAY_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
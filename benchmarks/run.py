@@ -0,0 +1,293 @@
+# Offline load test. Starts the fake OpenAI/Razorpay server in a separate
+# process (so it doesn't compete with the code under test for the GIL), points
+# the apps at it, drives their code paths from a thread pool and reports p50/p95/p99
+# latency and throughput per scenario. Each run is appended to
+# benchmarks/out/results.jsonl (not tracked) with the git commit and compared
+# with the last run of the same configuration, so regressions show up across
+# commits on the same machine.
+#   python -m benchmarks.run
+#   python -m benchmarks.run --scenarios chat,chat_stream,rag --requests 500 --concurrency 32
+#   python -m benchmarks.run --check 0.2   # exit 1 if p95 or throughput regressed by >20%
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_server import PNG_1PX
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS = Path(__file__).resolve().parent / "out" / "results.jsonl"
+QUESTIONS = [
+    "How can I open a savings account?",
+    "What is the minimum balance for a savings account?",
+    "How do I reset my net banking password?",
+    "Explain compound interest in three sentences.",
+    "How long does a fund transfer take?",
+    "Can I increase my credit card limit?",
+]
+
+
+@contextmanager
+def fake_server(latency, token_delay):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port),
+         "--latency", str(latency), "--token-delay", str(token_delay)],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("fake server did not start")
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def _configure(url, workdir):
+    # Must run before the app modules are imported: they read these at import
+    os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+    os.environ["OPENAI_API_BASE"] = f"{url}/v1"
+    os.environ["OPENAI_API_KEY"] = "test"
+    os.environ["RAZORPAY_BASE_URL"] = url
+    os.environ["RAZORPAY_KEY_ID"] = "rzp_test_bench"
+    os.environ["RAZORPAY_KEY_SECRET"] = "bench"
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    for path in (REPO_ROOT, REPO_ROOT / "LLM_applications"):
+        if str(path) not in sys.path:
+            sys.path.append(str(path))
+
+
+# ----------------------------------------------------------
+# Scenarios: each returns call(i), which makes one request. Streaming
+# scenarios return their time to first token as a float.
+# ----------------------------------------------------------
+def _question(i):
+    return QUESTIONS[i % len(QUESTIONS)]
+
+def chat():
+    from gpt_service import get_gpt_response
+    return lambda i: get_gpt_response(_question(i))
+
+def chat_stream():
+    from gpt_service import stream_gpt_response
+
+    def call(i):
+        timings = {}
+        for _ in stream_gpt_response(_question(i), timings=timings):
+            pass
+        return timings.get("ttft")
+    return call
+
+def vision():
+    from shared.llm_client import get_client
+    from shared.prompt_registry import get_prompt
+    client, tutor = get_client(), get_prompt("homework_tutor_system")
+    image = {"url": "data:image/png;base64," + base64.b64encode(PNG_1PX).decode()}
+    return lambda i: client.run(client.chat([
+        {"role": "system", "content": tutor.render()},
+        {"role": "user", "content": [
+            {"type": "text", "text": "Please solve this math problem with detailed steps and proper formulas."},
+            {"type": "image_url", "image_url": image},
+        ]},
+    ], template=tutor))
+
+def images():
+    from shared.llm_client import get_client
+    client = get_client()
+    return lambda i: client.run(client.images_generate(f"A watercolor of a bank branch, variant {i}"))
+
+def speech():
+    from shared.llm_client import get_client
+    client = get_client()
+    return lambda i: client.run(client.speech(_question(i)))
+
+def embeddings():
+    from shared.llm_client import get_client
+    client = get_client()
+    return lambda i: client.run(client.embeddings([_question(i)]))
+
+def save_message():
+    from db_service import init_db, save_message
+    init_db()
+    return lambda i: save_message(f"bench{i % 50}", "user", _question(i))
+
+def razorpay_order():
+    from db_service import init_db
+    from billing_service import create_razorpay_order
+    init_db()
+    return lambda i: create_razorpay_order(f"bench{i}")
+
+def rag():
+    # The AskMyBank chain as built in the notebook, with the offline retriever
+    from langchain_openai import OpenAI
+    from langchain.chains import create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from askmybank.index import load_faqs
+    from askmybank.local_retriever import LocalRetriever
+    from shared.prompt_registry import chat_prompt
+
+    prompt = chat_prompt([("system", "askmybank_system"), ("human", "askmybank_human")])
+    llm = OpenAI(temperature=0.3, max_tokens=500)
+    chain = create_retrieval_chain(LocalRetriever.from_dataframe(load_faqs(), k=5),
+                                   create_stuff_documents_chain(llm, prompt))
+    return lambda i: chain.invoke({"input": _question(i)})
+
+SCENARIOS = {f.__name__: f for f in (chat, chat_stream, vision, images, speech, embeddings,
+                                     save_message, razorpay_order, rag)}
+
+
+# ----------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------
+def _percentiles(samples):
+    samples = sorted(samples)
+    pct = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))] * 1000 if samples else 0.0
+    return {"p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+def measure(call, requests, concurrency):
+    latencies, ttfts, errors = [], [], []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            out = call(i)
+        except Exception as exc:
+            errors.append(repr(exc))
+            return
+        latencies.append(time.perf_counter() - start)
+        if isinstance(out, float):
+            ttfts.append(out)
+
+    call(0)  # warm-up: imports, connection setup, table creation
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    seconds = time.perf_counter() - start
+    result = {"requests": requests, "errors": len(errors), "seconds": seconds,
+              "throughput_rps": len(latencies) / seconds, **_percentiles(latencies)}
+    if ttfts:
+        result["ttft"] = _percentiles(ttfts)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+# ----------------------------------------------------------
+# Results
+# ----------------------------------------------------------
+def git_commit():
+    try:
+        run = lambda *args: subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        return run("rev-parse", "--short", "HEAD") + ("-dirty" if run("status", "--porcelain", "--untracked-files=no") else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def previous_run(path, config):
+    if not path.exists():
+        return None
+    previous = None
+    for line in path.read_text().splitlines():
+        record = json.loads(line)
+        if record.get("config") == config:
+            previous = record
+    return previous
+
+def regressions(current, previous, threshold):
+    found = []
+    for name, result in current["results"].items():
+        before = (previous or {}).get("results", {}).get(name)
+        if not before or "p95_ms" not in result or "p95_ms" not in before:
+            continue
+        if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            found.append(f"{name}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            found.append(f"{name}: throughput {before['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s")
+    return found
+
+def report(record, previous):
+    print(f"commit {record['commit']}   {record['config']}")
+    if previous:
+        print(f"compared with {previous['commit']} ({previous['timestamp']})")
+    print(f"{'scenario':<16}{'ok':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}   vs previous")
+    for name, r in record["results"].items():
+        if "skipped" in r:
+            print(f"{name:<16}  skipped: {r['skipped']}")
+            continue
+        before = (previous or {}).get("results", {}).get(name, {})
+        delta = ""
+        if before.get("p95_ms"):
+            delta = f"p95 {r['p95_ms'] / before['p95_ms'] - 1:+.0%}, req/s {r['throughput_rps'] / before['throughput_rps'] - 1:+.0%}"
+        print(f"{name:<16}{r['requests'] - r['errors']:>6}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{r['throughput_rps']:>9.1f}   {delta}")
+        if "ttft" in r:
+            print(f"{'  first token':<16}{'':>11}{r['ttft']['p50_ms']:>10.1f}{r['ttft']['p95_ms']:>10.1f}{r['ttft']['p99_ms']:>10.1f}")
+        if "first_error" in r:
+            print(f"{'':<16}first error: {r['first_error'][:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against a fake OpenAI/Razorpay server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=1.0, help="multiplier for the fake server's endpoint latencies")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--output", type=Path, default=RESULTS)
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the results file")
+    parser.add_argument("--check", type=float, metavar="FRACTION",
+                        help="exit 1 if any p95 or throughput regressed by more than FRACTION")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = set(names) - SCENARIOS.keys()
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    config = {"scenarios": names, "requests": args.requests, "concurrency": args.concurrency,
+              "latency": args.latency, "token_delay": args.token_delay}
+    results = {}
+    with fake_server(args.latency, args.token_delay) as url, tempfile.TemporaryDirectory() as workdir:
+        _configure(url, workdir)
+        for name in names:
+            try:
+                call = SCENARIOS[name]()
+            except ImportError as exc:
+                results[name] = {"skipped": f"missing dependency ({exc.name})"}
+                continue
+            results[name] = measure(call, args.requests, args.concurrency)
+
+    record = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "commit": git_commit(), "python": sys.version.split()[0], "config": config, "results": results}
+    previous = previous_run(args.output, config)
+    report(record, previous)
+    if not args.no_save:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    found = regressions(record, previous, args.check) if args.check is not None else []
+    for line in found:
+        print("REGRESSION", line)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
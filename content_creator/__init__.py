@@ -0,0 +1 @@
+# AI-Powered Content Creator: prompt, generation and batch helpers for the notebook.
@@ -0,0 +1,171 @@
+# Batch generation from a CSV or JSONL file of briefs.
+#
+#   python -m content_creator.batch briefs.csv results.jsonl --workers 8
+#
+# Each brief has the generate_content fields (content_type, topic, tone,
+# length, cta, keywords, audience). Identical briefs are generated once.
+# Results are appended to the JSONL output as each one finishes, so an
+# interrupted job can be re-run with the same arguments and only the missing
+# briefs are generated. On 429 responses every worker pauses together and
+# retries with jittered backoff.
+import csv
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from openai import RateLimitError
+
+from content_creator.generator import CONTENT_TYPES, make_llm, prepare_inputs, agenerate
+
+FIELDS = ["content_type", "topic", "tone", "length", "cta", "keywords", "audience"]
+DEFAULTS = {"content_type": "blog", "topic": "", "tone": "educational", "length": 400, "cta": "", "keywords": "", "audience": ""}
+
+
+def read_briefs(path):
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def brief_inputs(brief):
+    # Raises ValueError for a brief that can't be generated
+    values = {field: brief.get(field) or DEFAULTS[field] for field in FIELDS}
+    if not str(values["topic"]).strip():
+        raise ValueError("topic is required")
+    if values["content_type"] not in CONTENT_TYPES:
+        raise ValueError(f"unknown content_type {values['content_type']!r}, expected one of {', '.join(CONTENT_TYPES)}")
+    try:
+        length = int(values["length"])
+    except (TypeError, ValueError):
+        raise ValueError(f"length must be a whole number of words, got {values['length']!r}") from None
+    if length <= 0:
+        raise ValueError(f"length must be positive, got {length}")
+    return prepare_inputs(**{**values, "length": length})
+
+def brief_key(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+def completed_keys(output_path):
+    if not Path(output_path).exists():
+        return set()
+    keys = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                keys.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                pass  # a line cut short by an interrupted write
+    return keys
+
+
+def retry_after_seconds(value):
+    # Retry-After is either delta-seconds or an HTTP date; None if it is neither
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    # Shared cooldown: after a 429, no worker starts a request until it expires
+    def __init__(self):
+        self.resume_at = 0.0
+
+    async def wait(self):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def backoff(self, attempt, retry_after=None):
+        delay = retry_after if retry_after is not None else random.uniform(0, min(60.0, 2 ** attempt))
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+
+async def run_batch(input_path, output_path, workers=8, llm=None, max_retries=6, on_result=None):
+    # Returns {"total", "duplicates", "skipped", "generated", "failed", "errors", "seconds"};
+    # "errors" lists {"brief" (row number, from 1), "topic", "error"} for every failed brief
+    start = time.perf_counter()
+    llm = llm or make_llm(max_retries=0)  # retries are handled here
+    briefs = read_briefs(input_path)
+
+    unique, rows, errors = {}, {}, []
+    for row, brief in enumerate(briefs, 1):
+        try:
+            inputs = brief_inputs(brief)
+        except ValueError as e:
+            errors.append({"brief": row, "topic": brief.get("topic"), "error": str(e)})
+            continue
+        key = brief_key(inputs)
+        unique.setdefault(key, inputs)
+        rows.setdefault(key, row)
+    done = completed_keys(output_path)
+    pending = [(key, inputs) for key, inputs in unique.items() if key not in done]
+    summary = {"total": len(briefs), "duplicates": len(briefs) - len(unique) - len(errors),
+               "skipped": len(unique) - len(pending), "generated": 0, "failed": len(errors), "errors": errors}
+
+    def fail(key, inputs, error):
+        summary["failed"] += 1  # left out of the output, so a re-run retries it
+        errors.append({"brief": rows[key], "topic": inputs["topic"], "error": error})
+
+    semaphore = asyncio.Semaphore(workers)
+    limiter = RateLimiter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def generate(key, inputs):
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    await limiter.wait()
+                    try:
+                        content = await agenerate(inputs, llm)
+                        break
+                    except RateLimitError as e:
+                        if attempt == max_retries:
+                            fail(key, inputs, f"rate limited after {max_retries} retries")
+                            return
+                        response = getattr(e, "response", None)
+                        retry_after = response.headers.get("retry-after") if response is not None else None
+                        limiter.backoff(attempt, retry_after_seconds(retry_after))
+                    except Exception as e:
+                        fail(key, inputs, str(e))
+                        return
+            record = {"key": key, **inputs, "content": content}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            summary["generated"] += 1
+            if on_result is not None:
+                on_result(record)
+
+        await asyncio.gather(*(generate(key, inputs) for key, inputs in pending))
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate content for every brief in a CSV/JSONL file.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    summary = asyncio.run(run_batch(args.input, args.output, args.workers,
+                                    on_result=lambda r: print(f"✓ {r['content_type']}: {r['topic']}")))
+    for error in summary.pop("errors"):
+        print(f"✗ brief {error['brief']} ({error['topic']}): {error['error']}")
+    print(summary)
@@ -0,0 +1,24 @@
+# Tokens sent and wall-clock time for one campaign (all six content types):
+# sequential generate_content calls vs concurrent calls vs one
+# structured fan-out call. Point OPENAI_BASE_URL at the fake server
+# (python -m benchmarks.fake_server) to run it offline.
+#   python -m content_creator.bench_fanout
+import asyncio
+
+from content_creator.generator import CONTENT_TYPES
+from content_creator.fanout import generate_campaign
+from shared.prompt_registry import get_registry
+
+BRIEF = dict(topic="Benefits of compound interest for beginners", tone="educational", length=400,
+             cta="Subscribe for weekly tips", keywords="saving, investing", audience="college students")
+
+async def main():
+    for mode in ("sequential", "concurrent", "single"):
+        r = await generate_campaign(CONTENT_TYPES, mode=mode, **BRIEF)
+        print(f"{mode:<11} input tokens {r['input_tokens']:6d}   output tokens {r['output_tokens']:6d}   {r['seconds']:6.2f}s")
+    for key, stats in get_registry().stats().items():
+        if stats["renders"]:
+            print(f"{key:<28} renders {stats['renders']:3d}   prefix cache hit rate {stats['prefix_cache_hit_rate']:.0%}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
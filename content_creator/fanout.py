@@ -0,0 +1,82 @@
+# One brief, many content types.
+#
+# "single" mode asks for every selected content type in one JSON-mode call, so
+# the formatting rules and brief are sent once instead of once per type.
+# "concurrent" mode sends one request per type in parallel; the shared prompt
+# puts the system prompt and rules first and the brief last, so every request
+# shares a byte-identical prefix that provider-side prompt caching can reuse.
+# Both return per-type outputs plus token usage and wall-clock time.
+import json
+import time
+import asyncio
+
+from shared.prompt_registry import chat_prompt, get_prompt
+from content_creator.generator import prompt, prepare_inputs, finish, default_llm
+
+FANOUT_PROMPT = chat_prompt([
+    ("system", "content_creator_system"),
+    ("human", "content_creator_fanout"),
+])
+SYSTEM_TEMPLATE = get_prompt("content_creator_system")
+
+
+def _usage(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    SYSTEM_TEMPLATE.record_usage(usage.get("input_tokens", 0), cached)
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+def _result(mode, outputs, usage, start):
+    return {
+        "mode": mode,
+        "outputs": outputs,
+        "input_tokens": sum(u[0] for u in usage),
+        "output_tokens": sum(u[1] for u in usage),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+async def _one(template, inputs, llm):
+    message = await (template | llm).ainvoke(inputs)
+    return finish(inputs["content_type"], message.content), _usage(message)
+
+async def generate_sequential(content_types, topic, tone, length, cta="", keywords="", audience="", llm=None):
+    # The existing path: one generate_content-style call per type, one after another
+    llm, start = llm or default_llm(), time.perf_counter()
+    outputs, usage = {}, []
+    for content_type in content_types:
+        outputs[content_type], u = await _one(prompt, prepare_inputs(content_type, topic, tone, length, cta, keywords, audience), llm)
+        usage.append(u)
+    return _result("sequential", outputs, usage, start)
+
+async def generate_concurrent(content_types, topic, tone, length, cta="", keywords="", audience="", llm=None):
+    llm, start = llm or default_llm(), time.perf_counter()
+    results = await asyncio.gather(*(
+        _one(prompt, prepare_inputs(t, topic, tone, length, cta, keywords, audience), llm) for t in content_types
+    ))
+    return _result("concurrent", {t: out for t, (out, _) in zip(content_types, results)}, [u for _, u in results], start)
+
+async def generate_fanout(content_types, topic, tone, length, cta="", keywords="", audience="", llm=None):
+    # One structured call; any type missing from the reply is generated on its own
+    llm, start = llm or default_llm(), time.perf_counter()
+    inputs = prepare_inputs("blog" if "blog" in content_types else content_types[0], topic, tone, length, cta, keywords, audience)
+    inputs.pop("content_type")
+    json_llm = llm.bind(response_format={"type": "json_object"}, max_tokens=900 * len(content_types))
+    message = await (FANOUT_PROMPT | json_llm).ainvoke({**inputs, "content_types": ", ".join(content_types)})
+    usage = [_usage(message)]
+    try:
+        parsed = json.loads(message.content)
+    except ValueError:
+        parsed = {}
+
+    outputs = {t: finish(t, parsed[t]) for t in content_types if isinstance(parsed.get(t), str) and parsed[t].strip()}
+    missing = [t for t in content_types if t not in outputs]
+    if missing:
+        fallback = await generate_concurrent(missing, topic, tone, length, cta, keywords, audience, llm)
+        outputs.update(fallback["outputs"])
+        usage.append((fallback["input_tokens"], fallback["output_tokens"]))
+    return _result("single", {t: outputs[t] for t in content_types}, usage, start)
+
+async def generate_campaign(content_types, topic, tone, length, cta="", keywords="", audience="", mode="single", llm=None):
+    run = {"single": generate_fanout, "concurrent": generate_concurrent, "sequential": generate_sequential}[mode]
+    return await run(list(content_types), topic, tone, length, cta, keywords, audience, llm)
@@ -0,0 +1,63 @@
+# Prompt and single-piece generation, shared by the notebook UI and batch jobs.
+from langchain_openai import ChatOpenAI
+
+from shared.prompt_registry import chat_prompt
+
+CONTENT_TYPES = ["blog", "tweet", "linkedin", "instagram_caption", "video_script", "ad_copy"]
+TONES = ["professional", "casual", "persuasive", "educational", "playful"]
+
+# Static system prompt and formatting rules first, the brief last, so every
+# request shares a byte-identical prefix that provider-side caching can reuse
+prompt = chat_prompt([
+    ("system", "content_creator_system"),
+    ("human", "content_creator_human"),
+])
+
+
+_default_llm = None
+
+def make_llm(**kwargs):
+    return ChatOpenAI(**{"temperature": 0.5, "max_tokens": 900, "model": "gpt-4o-mini", **kwargs})
+
+def default_llm():
+    # Created on first use, after the notebook has set OPENAI_API_KEY
+    global _default_llm
+    if _default_llm is None:
+        _default_llm = make_llm()
+    return _default_llm
+
+def prepare_inputs(content_type, topic, tone, length, cta="", keywords="", audience=""):
+    # sane minimums for long forms
+    length = int(length)
+    if content_type in {"blog", "video_script"} and length < 120:
+        length = 200
+    return {
+        "content_type": content_type,
+        "topic": topic.strip(),
+        "tone": tone,
+        "length": length,
+        "cta": (cta or "").strip(),
+        "keywords": (keywords or "").strip(),
+        "audience": (audience or "").strip(),
+    }
+
+def finish(content_type, out):
+    out = out.strip()
+    if content_type == "tweet" and len(out) > 280:
+        out = out[:277].rstrip() + "..."
+    return out
+
+def generate_content(content_type, topic, tone, length, cta, keywords, audience, llm=None):
+    if not topic.strip():
+        return "Please enter a topic."
+    try:
+        chain = prompt | (llm or default_llm())
+        out = chain.invoke(prepare_inputs(content_type, topic, tone, length, cta, keywords, audience)).content
+        return finish(content_type, out)
+    except Exception as e:
+        return f"Oops—couldn't generate content: {e}"
+
+async def agenerate(inputs, llm):
+    # `inputs` as returned by prepare_inputs; errors propagate to the caller
+    out = (await (prompt | llm).ainvoke(inputs)).content
+    return finish(inputs["content_type"], out)
@@ -0,0 +1,3 @@
+# Helpers shared by the apps in this repository.
+# Apps add the repository root to sys.path and import from here, e.g.
+#   from shared.llm_client import get_client
@@ -0,0 +1,206 @@
+# Content-addressed on-disk cache for generated images, speech and podcasts.
+#
+# Artifacts are keyed by a hash of everything that determines the output
+# (model, prompt/text, voice, size, ...). Writes go to a temp file and are
+# renamed into place, so a reader never sees a half-written file. Concurrent
+# requests for the same key in one process wait for a single generation
+# (get_or_create from threads, get_or_create_async / get_or_create_many from
+# the event loop, key_lock around a longer multi-step generation), and the
+# store is trimmed least-recently-used first once it exceeds `max_bytes`.
+# The size is tracked as a running total (scanned once, then updated on every
+# put), so the tree is only walked when an eviction is actually due.
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", str(Path.home() / ".cache" / "genai-artifacts"))
+MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+def artifact_key(**parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._locks = {}  # key -> [lock, callers holding or waiting], dropped at zero
+        self._flights = {}  # (loop, key, suffix) -> future of the bytes being created on that loop
+        self._locks_lock = threading.Lock()
+        self._lock = threading.Lock()  # guards the counters and the size total
+        self._size = None  # bytes on disk, scanned on first put
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key, suffix):
+        # Two-level fan-out keeps directories small
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get(self, key, suffix):
+        path = self.path(key, suffix)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted since the read; the bytes are still good
+        return data
+
+    def put(self, key, data, suffix):
+        path = self.path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    @contextmanager
+    def key_lock(self, key):
+        # Held by whoever is generating `key`; others wait, then find it stored
+        with self._locks_lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def get_or_create(self, key, suffix, create):
+        # Returns (data, hit). `create()` must return the artifact bytes and is
+        # called at most once per key even if several sessions ask at once.
+        data = self.get(key, suffix)
+        if data is None:
+            with self.key_lock(key):
+                data = self.get(key, suffix)
+                if data is None:
+                    with self._lock:
+                        self.misses += 1
+                    data = create()
+                    self.put(key, data, suffix)
+                    return data, False
+        with self._lock:
+            self.hits += 1
+        return data, True
+
+    async def get_or_create_async(self, key, suffix, create):
+        # Like get_or_create, for code on the event loop: `create()` is a
+        # coroutine function. Returns (data, hit).
+        async def create_one(missing):
+            return [await create()]
+        (data,), hits = await self.get_or_create_many([key], suffix, create_one)
+        return data, bool(hits)
+
+    async def get_or_create_many(self, keys, suffix, create):
+        # `create(missing)` is a coroutine function returning the bytes for each
+        # of the `missing` keys, in order, so several artifacts can come from one
+        # request. Keys another caller on this loop is already creating are
+        # awaited instead. Returns (list of bytes per key, number not created here).
+        loop = asyncio.get_running_loop()
+        data, mine, waits = [None] * len(keys), [], {}
+        # Claimed before the store is checked, with no await in between, so
+        # two callers can't both miss and both create
+        for i, key in enumerate(keys):
+            flight = self._flights.get((loop, key, suffix))
+            if flight is None:
+                self._flights[(loop, key, suffix)] = loop.create_future()
+                mine.append(i)
+            else:
+                waits[i] = flight
+        missing = []
+        try:
+            stored = await asyncio.to_thread(lambda: [self.get(keys[i], suffix) for i in mine])
+            for i, found in zip(mine, stored):
+                data[i] = found
+            missing = [i for i in mine if data[i] is None]
+            if missing:
+                created = await create([keys[i] for i in missing])
+                for i, value in zip(missing, created):
+                    data[i] = value
+            for i in mine:
+                self._flights[(loop, keys[i], suffix)].set_result(data[i])
+            if missing:
+                await asyncio.to_thread(lambda: [self.put(keys[i], data[i], suffix) for i in missing])
+        except BaseException as exc:
+            for i in mine:
+                flight = self._flights[(loop, keys[i], suffix)]
+                if not flight.done():
+                    if isinstance(exc, asyncio.CancelledError):
+                        flight.cancel()
+                    else:
+                        flight.set_exception(exc)
+                        flight.exception()  # mark retrieved when nobody is waiting
+            raise
+        finally:
+            for i in mine:
+                self._flights.pop((loop, keys[i], suffix), None)
+        for i, flight in waits.items():
+            data[i] = await asyncio.shield(flight)
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return data, len(keys) - len(missing)
+
+    def _scan(self):
+        # (path, stat) pairs for every artifact, and their total size
+        stats = []
+        for path in self.root.glob("*/*"):
+            if not path.name.startswith(".tmp-"):
+                try:
+                    stats.append((path, path.stat()))
+                except FileNotFoundError:
+                    pass  # removed by another process
+        return stats, sum(stat.st_size for _, stat in stats)
+
+    def _evict(self):
+        # Called with self._lock held. Rescans, since other processes may share
+        # the directory, and trims to 90% of the limit so the next few puts
+        # don't each trigger a scan.
+        stats, total = self._scan()
+        target = self.max_bytes * 0.9
+        if total > self.max_bytes:
+            for path, stat in sorted(stats, key=lambda item: item[1].st_mtime):
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+                if total <= target:
+                    break
+        self._size = total
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,61 @@
+# One audio player for speech that arrives in parts (see shared.tts_pipeline).
+#
+# st.audio makes a separate player per part, so playback stops at the end of
+# the first one. SequentialPlayer renders a single <audio> element and queues
+# each part on it as the part arrives: when one part ends the next one starts,
+# and if the next part isn't there yet the player waits for it. Every
+# components.html call is its own iframe, so parts are handed to the player
+# through a queue on the parent page.
+import json
+import uuid
+import base64
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+PLAYER = """
+<audio id="player" controls autoplay style="width: 100%%"></audio>
+<script>
+const id = %(id)s, host = window.parent;
+const queues = host.__audioQueues = host.__audioQueues || {};
+const wake = host.__audioWake = host.__audioWake || {};
+const queue = queues[id] = queues[id] || [];
+const audio = document.getElementById("player");
+let playing = false;
+function next() {
+  if (!queue.length) { playing = false; return; }
+  playing = true;
+  audio.src = queue.shift();
+  audio.play().catch(() => {});
+}
+audio.addEventListener("ended", next);
+wake[id] = () => { if (!playing) next(); };
+next();
+</script>
+"""
+
+PART = """
+<script>
+const id = %(id)s, host = window.parent;
+const queues = host.__audioQueues = host.__audioQueues || {};
+(queues[id] = queues[id] || []).push(%(uri)s);
+if (host.__audioWake && host.__audioWake[id]) host.__audioWake[id]();
+</script>
+"""
+
+
+class SequentialPlayer:
+    def __init__(self, container=None, mime="audio/mpeg"):
+        self.id = json.dumps(uuid.uuid4().hex)
+        self.container = container if container is not None else st.container()
+        self.mime = mime
+        self.parts = 0
+        with self.container:
+            components.html(PLAYER % {"id": self.id}, height=60)
+
+    def add(self, data):
+        # Queue one more part; plays right away if the player is idle
+        uri = f"data:{self.mime};base64,{base64.b64encode(data).decode('ascii')}"
+        with self.container:
+            components.html(PART % {"id": self.id, "uri": json.dumps(uri)}, height=0)
+        self.parts += 1
@@ -0,0 +1,158 @@
+# Background job queue for image generation, shared by the image apps.
+#
+# - submit() returns a job id at once; the job runs on the shared LLM client's
+#   event loop, at most `workers` jobs at a time, and the app polls get(job_id)
+#   between reruns instead of blocking the script for the whole render
+# - the n variants of a job go out as a single request, and only for the
+#   variants not already in the artifact store or being generated by another
+#   job, which are awaited instead
+# - drafts are opt-in: a separate low-quality JPEG generation of the missing
+#   variants is requested alongside the full one. It is a different image and
+#   an extra paid call (a fraction of a full render), usually arrives well
+#   before it, and is shown, labelled as a draft, until the full images arrive
+# - queue depth, running jobs and per-job queue wait, time to preview and
+#   total latency are exported through shared.telemetry
+import time
+import uuid
+import base64
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from shared.llm_client import get_client
+from shared.artifact_store import get_store, artifact_key
+from shared.telemetry import get_telemetry
+
+WORKERS = 4
+# Request options for a cheap draft, per model; other models get no draft
+PREVIEW_OPTIONS = {
+    "gpt-image-1": {"quality": "low", "output_format": "jpeg", "output_compression": 60},
+}
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImageJob:
+    id: str
+    prompt: str
+    model: str
+    size: str
+    n: int
+    preview: bool
+    status: str = "queued"  # queued, running, done, failed
+    previews: list = field(default_factory=list)  # draft bytes per missing variant, until images are ready
+    images: list = field(default_factory=list)  # PNG bytes per variant
+    cached: int = 0  # variants served from the artifact store or another job
+    error: str = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    preview_at: float = None
+    finished_at: float = None
+    finished: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    @property
+    def seconds(self):
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+
+class ImageJobQueue:
+    def __init__(self, client=None, store=None, workers=WORKERS, keep=200):
+        self.client = client or get_client()
+        self.store = store or get_store()
+        self.workers = workers
+        self.keep = keep  # finished jobs kept for polling, oldest dropped first
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = None  # asyncio.Semaphore, created on the client loop
+        self.telemetry = get_telemetry()
+        self.telemetry.register_collector(self._gauges)
+
+    def submit(self, prompt, n=1, model="gpt-image-1", size="1024x1024", preview=False):
+        job = ImageJob(uuid.uuid4().hex[:12], prompt, model, size, n, preview and model in PREVIEW_OPTIONS)
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for job_id in finished[:max(0, len(self._jobs) - self.keep)]:
+                del self._jobs[job_id]
+        self.client.submit(self._run(job))
+        return job.id
+
+    def get(self, job_id):
+        # None once the job has been dropped
+        return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        job = self._jobs[job_id]
+        job.finished.wait(timeout)
+        return job
+
+    def _key(self, job, variant):
+        # Variant 0 shares its key with single images generated before variants existed
+        parts = dict(kind="image", model=job.model, prompt=job.prompt, size=job.size)
+        return artifact_key(**parts, variant=variant) if variant else artifact_key(**parts)
+
+    async def _run(self, job):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            job.status = "running"
+            self.telemetry.observe("image_job_wait_seconds", job.seconds, model=job.model)
+            try:
+                async def generate(missing):
+                    full = asyncio.ensure_future(self.client.images_generate(
+                        job.prompt, model=job.model, n=len(missing), size=job.size))
+                    if job.preview:
+                        await self._preview(job, len(missing), full)
+                    return [base64.b64decode(b64) for b64 in await full]
+
+                keys = [self._key(job, i) for i in range(job.n)]
+                job.images, job.cached = await self.store.get_or_create_many(keys, ".png", generate)
+                job.status = "done"
+            except Exception as exc:
+                job.error = str(exc)
+                job.status = "failed"
+            finally:
+                job.previews = []
+                job.finished_at = time.monotonic()
+                self.telemetry.observe("image_job_seconds", job.seconds, model=job.model, status=job.status)
+                job.finished.set()
+
+    async def _preview(self, job, n, full):
+        # Best effort: a failed draft only means waiting for the full images
+        options = {"size": job.size, **PREVIEW_OPTIONS[job.model]}
+        preview = asyncio.ensure_future(self.client.images_generate(job.prompt, model=job.model, n=n, **options))
+        await asyncio.wait([preview, full], return_when=asyncio.FIRST_COMPLETED)
+        if full.done():
+            preview.cancel()
+            return
+        try:
+            job.previews = [base64.b64decode(b64) for b64 in await preview]
+            job.preview_at = time.monotonic()
+            self.telemetry.observe("image_job_preview_seconds", job.preview_at - job.submitted_at, model=job.model)
+        except Exception:
+            logger.warning("Preview for image job %s failed", job.id, exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {"queued": sum(j.status == "queued" for j in jobs), "running": sum(j.status == "running" for j in jobs)}
+
+    def _gauges(self):
+        stats = self.stats()
+        return [("image_job_queue_depth", {}, stats["queued"]), ("image_jobs_running", {}, stats["running"])]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_image_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ImageJobQueue()
+        return _queue
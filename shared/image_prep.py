@@ -0,0 +1,131 @@
+# Shrinks uploaded photos before they are sent to a vision model.
+#
+# Vision models scale images down to fit 2048x2048 and then to 768px on the
+# short side, so anything larger is wasted upload. Images are decoded once,
+# downscaled to that resolution, re-encoded as JPEG (or WebP) under a byte
+# budget and returned with the right MIME type.
+#
+# fingerprint() records what an image looks like rather than its bytes, so a
+# re-uploaded or re-encoded copy of the same photo can be recognised.
+import io
+import base64
+import hashlib
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageOps
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    original_bytes: int
+    width: int
+    height: int
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - len(self.data)
+
+    @property
+    def data_uri(self):
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+def _fit(width, height, max_side, short_side):
+    scale = min(1.0, max_side / max(width, height), short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=quality, optimize=True)
+    return buf.getvalue()
+
+def prepare_image(data, max_side=2048, short_side=768, target_bytes=400_000, fmt="JPEG", min_quality=50):
+    # `data` is the raw upload (bytes or a file-like object such as a Streamlit UploadedFile)
+    if hasattr(data, "read"):
+        data = data.getvalue() if hasattr(data, "getvalue") else data.read()
+
+    img = Image.open(io.BytesIO(data))
+    original_format = img.format
+    img = ImageOps.exif_transpose(img)  # phone photos are often stored sideways
+    original_size = img.size
+    size = _fit(img.width, img.height, max_side, short_side)
+
+    # Already small enough in a format the API accepts: send it untouched
+    if size == original_size and len(data) <= target_bytes and original_format in MIME_TYPES:
+        return PreparedImage(data, MIME_TYPES[original_format], len(data), img.width, img.height)
+
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.convert("RGBA").getchannel("A"))
+        img = background
+
+    quality = 85
+    encoded = _encode(img, fmt, quality)
+    while len(encoded) > target_bytes and quality > min_quality:
+        quality -= 10
+        encoded = _encode(img, fmt, quality)
+
+    # Re-encoding a small, already compressed file can make it bigger
+    if len(encoded) >= len(data) and size == original_size and original_format in MIME_TYPES:
+        return PreparedImage(data, MIME_TYPES[original_format], len(data), img.width, img.height)
+    return PreparedImage(encoded, MIME_TYPES[fmt], len(data), img.width, img.height)
+
+
+@dataclass
+class ImageFingerprint:
+    # What an image looks like, for matching re-uploaded copies of the same photo.
+    # `phash` is a 256-bit difference hash, cheap to compare but blind to small
+    # details like a single changed digit, so it only shortlists candidates.
+    # `thumbnail` is a PNG of the contrast-normalised 512x512 grayscale image;
+    # comparing it block by block confirms the match.
+    sha256: str
+    phash: int
+    thumbnail: bytes
+
+    def matches(self, other, max_hash_distance=32, max_block_diff=24):
+        if self.sha256 == other.sha256:
+            return True
+        if hash_distance(self.phash, other.phash) > max_hash_distance:
+            return False
+        return thumbnail_distance(self.thumbnail, other.thumbnail) <= max_block_diff
+
+
+def hash_distance(a, b):
+    # Number of differing bits between two perceptual hashes
+    return bin(a ^ b).count("1")
+
+def thumbnail_distance(a, b, block=4):
+    # Largest mean absolute difference (0-255) over block x block pixel tiles.
+    # Re-encoding and exposure changes stay under ~20; a changed digit on a
+    # worksheet scores 35+. Resized copies also score high, so they don't match.
+    a, b = Image.open(io.BytesIO(a)), Image.open(io.BytesIO(b))
+    if a.size != b.size:
+        return 255
+    diff = ImageChops.difference(a, b)
+    return diff.resize((a.width // block, a.height // block), Image.BOX).getextrema()[1]
+
+def fingerprint(data, size=512, hash_size=16):
+    if hasattr(data, "read"):
+        data = data.getvalue() if hasattr(data, "getvalue") else data.read()
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (size * 2, size * 2))  # JPEG: decode at reduced size
+    img = ImageOps.exif_transpose(img).convert("L")
+    thumb = ImageOps.autocontrast(img.resize((size, size), Image.BOX), cutoff=1)
+
+    # Difference hash: one bit per pixel, set when brighter than its right neighbour
+    small = thumb.resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (small[offset + col] > small[offset + col + 1])
+
+    buf = io.BytesIO()
+    thumb.save(buf, format="PNG")
+    return ImageFingerprint(hashlib.sha256(data).hexdigest(), bits, buf.getvalue())
@@ -0,0 +1,244 @@
+# One OpenAI client per process, shared by every Streamlit session.
+#
+# - asyncio API on a background event loop, with sync bridges (run / iter_sync)
+#   for Streamlit scripts
+# - a single pooled HTTP transport, so calls reuse keep-alive TCP/TLS connections
+# - a global semaphore capping in-flight requests
+# - retries with jittered exponential backoff on 429 / 5xx / connection errors
+# - per-call latency metrics by endpoint, and token usage counters, exported
+#   through shared.telemetry
+# - prompt-cache usage reported back to the prompt registry when a chat call
+#   passes the template its system prompt came from (`template=`)
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import defaultdict, deque
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIStatusError, APIConnectionError, OpenAIError
+
+from shared.telemetry import get_telemetry
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# OPENAI_API_BASE is accepted too, so a local fake server can stand in for OpenAI
+BASE_URL = os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE")
+
+
+class LatencyMetrics:
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(lambda: {"calls": 0, "errors": 0, "retries": 0})
+
+    def record(self, name, seconds, error=False):
+        with self._lock:
+            self._latencies[name].append(seconds)
+            self._counts[name]["calls"] += 1
+            if error:
+                self._counts[name]["errors"] += 1
+
+    def record_retry(self, name):
+        with self._lock:
+            self._counts[name]["retries"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for name, counts in self._counts.items():
+                samples = sorted(self._latencies[name])
+                pct = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))] * 1000 if samples else 0.0
+                out[name] = dict(counts, p50_ms=pct(0.50), p95_ms=pct(0.95), p99_ms=pct(0.99))
+            return out
+
+    def gauges(self):
+        # Telemetry collector: the snapshot as (name, labels, value)
+        for endpoint, stats in self.snapshot().items():
+            for stat, value in stats.items():
+                yield f"llm_client_{stat}", {"endpoint": endpoint}, value
+
+
+def _retryable(exc):
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return isinstance(exc, APIConnectionError)  # includes timeouts
+
+def _retry_after(exc):
+    if isinstance(exc, APIStatusError):
+        try:
+            return float(exc.response.headers.get("retry-after", ""))
+        except ValueError:
+            pass
+    return None
+
+def _record_usage(model, template, usage):
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    telemetry = get_telemetry()
+    telemetry.count("llm_prompt_tokens_total", usage.prompt_tokens, model=model)
+    telemetry.count("llm_cached_prompt_tokens_total", cached, model=model)
+    telemetry.count("llm_completion_tokens_total", usage.completion_tokens or 0, model=model)
+    if template is not None:
+        template.record_usage(usage.prompt_tokens, cached)
+
+
+class LLMClient:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_connections=MAX_CONNECTIONS,
+                 max_retries=MAX_RETRIES, timeout=TIMEOUT, base_url=BASE_URL):
+        self.max_retries = max_retries
+        self.base_url = base_url
+        self.timeout = timeout
+        self.metrics = LatencyMetrics()
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client-loop", daemon=True)
+        self._thread.start()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+
+    # ----------------------------------------------------------
+    # Sync bridges for Streamlit scripts
+    # ----------------------------------------------------------
+    def submit(self, coro):
+        # Schedules `coro` on the client loop and returns a concurrent.futures.Future
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        return self.submit(coro).result()
+
+    def iter_sync(self, agen):
+        # Drives an async generator on the client loop and yields its items
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
+
+    # ----------------------------------------------------------
+    # Core
+    # ----------------------------------------------------------
+    def openai(self, api_key=None):
+        # One AsyncOpenAI for OPENAI_API_KEY, on the shared connection pool.
+        # A key supplied by the user gets a per-call copy (with_options, same
+        # pool) that isn't kept, so user keys don't accumulate in memory.
+        # Retries are handled here instead.
+        default_key = os.getenv("OPENAI_API_KEY")
+        if not (api_key or default_key):
+            raise OpenAIError("No OpenAI API key: set OPENAI_API_KEY or enter a key")
+        with self._clients_lock:
+            base = self._clients.get(default_key)
+            if base is None:
+                base = self._clients[default_key] = AsyncOpenAI(
+                    api_key=default_key or "", base_url=self.base_url, http_client=self._http, max_retries=0
+                )
+        if api_key and api_key != default_key:
+            return base.with_options(api_key=api_key)
+        return base
+
+    async def _backoff(self, name, attempt, exc):
+        self.metrics.record_retry(name)
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(30.0, 0.5 * 2 ** attempt))  # full jitter
+        await asyncio.sleep(delay)
+
+    async def call(self, name, fn, *args, **kwargs):
+        # Runs `await fn(*args, **kwargs)` under the concurrency limit, with retries
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as exc:
+                    self.metrics.record(name, time.perf_counter() - start, error=True)
+                    if attempt == self.max_retries or not _retryable(exc):
+                        raise
+                    retry_exc = exc
+                else:
+                    self.metrics.record(name, time.perf_counter() - start)
+                    return result
+            await self._backoff(name, attempt, retry_exc)
+
+    # ----------------------------------------------------------
+    # Endpoints
+    # ----------------------------------------------------------
+    async def chat(self, messages, model="gpt-4o-mini", api_key=None, template=None, **kwargs):
+        resp = await self.call("chat", self.openai(api_key).chat.completions.create,
+                               model=model, messages=messages, **kwargs)
+        _record_usage(model, template, resp.usage)
+        return resp.choices[0].message.content
+
+    async def chat_stream(self, messages, model="gpt-4o-mini", api_key=None, template=None, **kwargs):
+        # Yields content tokens. Retries only happen before the first token.
+        # The concurrency slot is held until the stream is finished.
+        name = "chat_stream"
+        kwargs.setdefault("stream_options", {"include_usage": True})  # usage arrives in the last chunk
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    stream = await self.openai(api_key).chat.completions.create(
+                        model=model, messages=messages, stream=True, **kwargs
+                    )
+                except Exception as exc:
+                    self.metrics.record(name, time.perf_counter() - start, error=True)
+                    if attempt == self.max_retries or not _retryable(exc):
+                        raise
+                    retry_exc = exc
+                else:
+                    try:
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                            _record_usage(model, template, getattr(chunk, "usage", None))
+                    finally:
+                        await stream.close()
+                        self.metrics.record(name, time.perf_counter() - start)
+                    return
+            await self._backoff(name, attempt, retry_exc)
+
+    async def embeddings(self, inputs, model="text-embedding-3-small", api_key=None):
+        resp = await self.call("embeddings", self.openai(api_key).embeddings.create, model=model, input=inputs)
+        return [d.embedding for d in resp.data]
+
+    async def images_generate(self, prompt, model="gpt-image-1", n=1, size="1024x1024", api_key=None, **kwargs):
+        # Returns base64 images. gpt-image models always return base64 and
+        # reject response_format; DALL·E returns URLs unless asked for base64.
+        if not model.startswith("gpt-image"):
+            kwargs.setdefault("response_format", "b64_json")
+        resp = await self.call("images", self.openai(api_key).images.generate,
+                               model=model, prompt=prompt, n=n, size=size, **kwargs)
+        return [d.b64_json for d in resp.data]
+
+    async def speech(self, text, voice="alloy", model="gpt-4o-mini-tts", api_key=None, **kwargs):
+        resp = await self.call("speech", self.openai(api_key).audio.speech.create,
+                               model=model, voice=voice, input=text, **kwargs)
+        return resp.content
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+            get_telemetry().register_collector(_client.metrics.gauges)
+        return _client
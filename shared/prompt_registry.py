@@ -0,0 +1,149 @@
+# Prompt templates shared by the apps, loaded once per process.
+#
+# Templates live in shared/prompts/ as <name>.v<version>.txt and use
+# str.format / LangChain f-string placeholders ({var}, {{ for a literal brace}).
+# The registry:
+# - parses every template once, on first use
+# - validates variables up front: missing or unexpected values raise ValueError
+#   before anything is sent to a model
+# - keeps the static part of each template (everything before the first
+#   placeholder) byte-identical across renders, so provider-side prompt
+#   caching can reuse it; templates put their variables last for that reason
+# - counts renders per template and, when callers report token usage, the
+#   share of prompt tokens served from the provider's prefix cache
+import re
+import threading
+from pathlib import Path
+from string import Formatter
+
+PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+FILENAME_PATTERN = re.compile(r"^(?P<name>[a-z0-9_]+)\.v(?P<version>\d+)\.txt$")
+
+
+class PromptTemplate:
+    def __init__(self, name, version, text):
+        self.name = name
+        self.version = version
+        self.text = text
+        fields = [field for _, field, _, _ in Formatter().parse(text) if field is not None]
+        if any(not f.isidentifier() for f in fields):
+            raise ValueError(f"prompt {self.key}: placeholders must be plain names, got {fields}")
+        self.variables = frozenset(fields)
+        first = re.search(r"(?<!\{)\{(?!\{)", text)
+        self.static_prefix = (text[:first.start()] if first else text).replace("{{", "{").replace("}}", "}")
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @property
+    def key(self):
+        return f"{self.name}@v{self.version}"
+
+    def validate(self, values):
+        missing = self.variables - values.keys()
+        extra = values.keys() - self.variables
+        if missing or extra:
+            raise ValueError(f"prompt {self.key}: missing {sorted(missing)}, unexpected {sorted(extra)}")
+
+    def record_render(self):
+        with self._lock:
+            self.renders += 1
+
+    def render(self, **values):
+        self.validate(values)
+        self.record_render()
+        return self.text.format(**values) if self.variables else self.text
+
+    def record_usage(self, prompt_tokens, cached_tokens=0):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens or 0
+            self.cached_tokens += cached_tokens or 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "renders": self.renders,
+                "static_prefix_chars": len(self.static_prefix),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prefix_cache_hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+class PromptRegistry:
+    def __init__(self, directory=PROMPT_DIR):
+        self._templates = {}
+        for path in sorted(Path(directory).glob("*.txt")):
+            match = FILENAME_PATTERN.match(path.name)
+            if not match:
+                raise ValueError(f"unexpected prompt file name: {path.name}")
+            text = path.read_text(encoding="utf-8")
+            text = text[:-1] if text.endswith("\n") else text  # editors add a final newline
+            template = PromptTemplate(match["name"], int(match["version"]), text)
+            self._templates.setdefault(template.name, {})[template.version] = template
+
+    def get(self, name, version=None):
+        # Latest version unless one is pinned
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"unknown prompt: {name}")
+        if version is None:
+            version = max(versions)
+        if version not in versions:
+            raise KeyError(f"unknown prompt version: {name}@v{version}")
+        return versions[version]
+
+    def stats(self):
+        return {t.key: t.stats() for versions in self._templates.values() for t in versions.values()}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
+
+def get_prompt(name, version=None):
+    return get_registry().get(name, version)
+
+
+_tracked_class = None
+
+def chat_prompt(messages):
+    # LangChain ChatPromptTemplate from (role, template name) pairs. Built once
+    # by the caller and reused; each format counts as a render of every
+    # template it uses. Requires langchain-core.
+    global _tracked_class
+    from langchain_core.prompts import ChatPromptTemplate
+
+    if _tracked_class is None:
+        class TrackedChatPromptTemplate(ChatPromptTemplate):
+            registry_templates: list = []
+
+            def _record(self, kwargs):
+                # kwargs carry the variables of every message, so only check for gaps
+                for template in self.registry_templates:
+                    missing = template.variables - kwargs.keys()
+                    if missing:
+                        raise ValueError(f"prompt {template.key}: missing {sorted(missing)}")
+                    template.record_render()
+
+            def format_messages(self, **kwargs):
+                self._record(kwargs)
+                return super().format_messages(**kwargs)
+
+            async def aformat_messages(self, **kwargs):
+                self._record(kwargs)
+                return await super().aformat_messages(**kwargs)
+
+        _tracked_class = TrackedChatPromptTemplate
+
+    templates = [(role, get_prompt(name)) for role, name in messages]
+    prompt = _tracked_class.from_messages([(role, t.text) for role, t in templates])
+    prompt.registry_templates = [t for _, t in templates]
+    return prompt
@@ -0,0 +1,150 @@
+# Chunked text-to-speech for long scripts.
+#
+# Text is split at sentence boundaries into chunks (a short first chunk so
+# audio starts quickly, larger ones after), the chunks are synthesized
+# concurrently, and the audio is yielded back in order as soon as each next
+# chunk is ready. MP3 chunks can simply be concatenated into one file.
+import re
+import time
+import asyncio
+import textwrap
+
+from shared.artifact_store import artifact_key
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+FIRST_CHUNK_CHARS = 200
+MAX_CHUNK_CHARS = 800  # well under the 4096-character TTS input limit
+
+
+def split_text(text, first_chars=FIRST_CHUNK_CHARS, max_chars=MAX_CHUNK_CHARS):
+    sentences = []
+    for sentence in SENTENCE_BREAK.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        if sentence:
+            # A single overlong sentence is broken at whitespace
+            sentences.extend(textwrap.wrap(sentence, max_chars))
+
+    chunks, current, limit = [], "", first_chars
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > limit:
+            chunks.append(current)
+            current, limit = "", max_chars
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _speak(client, chunk, semaphore, voice, model, api_key, store):
+    async def create():
+        async with semaphore:
+            return await client.speech(chunk, voice=voice, model=model, api_key=api_key)
+    if store is None:
+        return await create()
+    # Identical chunks requested at once (two sessions, or a repeated line) are synthesized once
+    key = artifact_key(kind="speech", model=model, text=chunk, voice=voice)
+    return (await store.get_or_create_async(key, ".mp3", create))[0]
+
+
+async def synthesize(client, text, voice="alloy", model="gpt-4o-mini-tts", api_key=None,
+                     concurrency=4, store=None, timings=None):
+    # Async generator of MP3 bytes, one item per chunk, in order. Chunks are
+    # cached individually in `store` (an ArtifactStore) when given. Pass a dict
+    # as `timings` to get `first_audio` and `total` seconds and `chunks`.
+    start = time.perf_counter()
+    chunks = split_text(text)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_speak(client, chunk, semaphore, voice, model, api_key, store)) for chunk in chunks]
+    try:
+        for task in tasks:
+            data = await task
+            if timings is not None and "first_audio" not in timings:
+                timings["first_audio"] = time.perf_counter() - start
+            yield data
+    finally:
+        for task in tasks:
+            task.cancel()
+    if timings is not None:
+        timings["total"] = time.perf_counter() - start
+        timings["chunks"] = len(chunks)
+
+
+def _cut(buffer, limit, max_chars):
+    # Index at which to cut a finished chunk off the front of `buffer`, or None
+    # to wait for more text: the last sentence break once `limit` characters
+    # are buffered, or the last space if a single sentence runs past `max_chars`.
+    if len(buffer) < limit:
+        return None
+    breaks = [m.end() for m in SENTENCE_BREAK.finditer(buffer) if m.end() <= max_chars]
+    if breaks:
+        return breaks[-1]
+    if len(buffer) >= max_chars:
+        space = buffer.rfind(" ", 0, max_chars)
+        return space + 1 if space > 0 else max_chars
+    return None
+
+
+async def synthesize_stream(client, tokens, voice="alloy", model="gpt-4o-mini-tts", api_key=None,
+                            concurrency=4, store=None, timings=None):
+    # Pipelines text generation into TTS. `tokens` is an async iterator of text
+    # (e.g. LLMClient.chat_stream); completed sentences are sent to TTS while
+    # later text is still being written. Yields ("text", token) as text arrives
+    # and ("audio", mp3_bytes) for each chunk, in order. `timings` gets
+    # `first_token`, `script`, `first_audio`, `total` seconds and `chunks`.
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    events = asyncio.Queue()
+    pending = asyncio.Queue()  # TTS tasks in script order; None marks the end
+    tasks = []
+
+    def speak(chunk):
+        chunk = " ".join(chunk.split())
+        if chunk:
+            task = asyncio.create_task(_speak(client, chunk, semaphore, voice, model, api_key, store))
+            tasks.append(task)
+            pending.put_nowait(task)
+
+    async def read_script():
+        buffer, limit = "", FIRST_CHUNK_CHARS
+        try:
+            async for token in tokens:
+                if timings is not None and "first_token" not in timings:
+                    timings["first_token"] = time.perf_counter() - start
+                events.put_nowait(("text", token))
+                buffer += token
+                cut = _cut(buffer, limit, MAX_CHUNK_CHARS)
+                while cut is not None:
+                    speak(buffer[:cut])
+                    buffer, limit = buffer[cut:], MAX_CHUNK_CHARS
+                    cut = _cut(buffer, limit, MAX_CHUNK_CHARS)
+            speak(buffer)
+            if timings is not None:
+                timings["script"] = time.perf_counter() - start
+        finally:
+            pending.put_nowait(None)
+
+    async def emit_audio():
+        while (task := await pending.get()) is not None:
+            data = await task
+            if timings is not None and "first_audio" not in timings:
+                timings["first_audio"] = time.perf_counter() - start
+            events.put_nowait(("audio", data))
+
+    async def run():
+        try:
+            await asyncio.gather(read_script(), emit_audio())
+        finally:
+            events.put_nowait(None)
+
+    runner = asyncio.create_task(run())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await runner  # re-raises any error from the script or TTS
+    finally:
+        runner.cancel()
+        for task in tasks:
+            task.cancel()
+    if timings is not None:
+        timings["total"] = time.perf_counter() - start
+        timings["chunks"] = len(tasks)